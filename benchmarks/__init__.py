@@ -0,0 +1,21 @@
+"""Benchmarks for funbox.
+
+The suite times every case in benchmarks.cases at each input size, and
+measures its peak memory with tracemalloc and the memory blocks it leaves
+allocated.  Everything it needs is generated, so it runs offline.
+
+Run from the top of the source tree:
+
+    python -m benchmarks                          # all of it
+    python -m benchmarks --only op,maybe --sizes 1000,1000000
+    python -m benchmarks --output before.json     # save the results
+    python -m benchmarks --baseline before.json   # flag regressions
+
+With --baseline, cases which got slower or used more memory than the
+baseline by more than --tolerance are flagged, and the exit status is 1.
+
+The other modules here are standalone comparisons against older
+implementations and alternatives, e.g. python benchmarks/currying.py.
+
+Not installed with the package.
+"""
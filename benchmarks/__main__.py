@@ -0,0 +1,69 @@
+"""Command line for the benchmark suite.  See benchmarks/__init__.py.
+"""
+
+import argparse
+import sys
+
+from benchmarks import cases  # registers the cases
+from benchmarks import runner
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description="Benchmark funbox.")
+    parser.add_argument('--only',
+                        help="comma-separated funbox modules to benchmark")
+    parser.add_argument('--sizes', default='1000,100000',
+                        help="comma-separated input sizes (default 1000,100000)")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="timing rounds per case, taking the best")
+    parser.add_argument('--output', help="save the results as JSON here")
+    parser.add_argument('--baseline',
+                        help="compare with results saved by --output")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="fraction slower or bigger than the baseline "
+                             "that counts as a regression (default 0.25)")
+    parser.add_argument('--list', action='store_true',
+                        help="list the cases and exit")
+    options = parser.parse_args(argv)
+
+    selected = runner.CASES
+    if options.only:
+        modules = set(options.only.split(','))
+        unknown = modules - set(bench.module for bench in runner.CASES)
+        if unknown:
+            parser.error("no cases for %s" % ', '.join(sorted(unknown)))
+        selected = [bench for bench in selected if bench.module in modules]
+    if options.list:
+        for bench in selected:
+            print('%-18s %s' % (bench.module, bench.name))
+        return 0
+    sizes = [int(size) for size in options.sizes.split(',')]
+    baseline = runner.load(options.baseline) if options.baseline else None
+
+    print(runner.HEADING)
+    def report(result):
+        print(runner.format_result(result))
+        sys.stdout.flush()
+    document = runner.run_suite(selected, sizes, options.repeat, report)
+    if options.output:
+        runner.save(document, options.output)
+    if baseline is None:
+        return 0
+
+    print('')
+    print('Compared with %s (tolerance %d%%):' % (options.baseline,
+                                                options.tolerance * 100))
+    regressions = 0
+    for result, time_ratio, memory_ratio, regressed in runner.compare(
+            document, baseline, options.tolerance):
+        regressions += regressed
+        print('%-18s %-26s %9d  time x%.2f  memory x%.2f%s' % (
+            result['module'], result['case'], result['size'],
+            time_ratio, memory_ratio, '  REGRESSION' if regressed else ''))
+    print('%d regression(s)' % regressions)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
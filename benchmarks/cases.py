@@ -0,0 +1,284 @@
+"""The benchmark cases, grouped by funbox module.
+
+Each setup function takes the input size and returns the function to
+measure.  Inputs come from a seeded random.Random, so every run measures
+the same data.
+"""
+
+import io
+import random
+
+from funbox import csv_records, dates, lists, mappings, maybe, op, strings
+from funbox import iterators
+from funbox.iterators import ordered
+
+from .runner import case
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _rng():
+    return random.Random(42)
+
+def _words(rng, count, letters='abcdefghijklmnopqrstuvwxyz'):
+    return [''.join(rng.choice(letters) for _ in range(rng.randint(3, 9)))
+            for _ in range(count)]
+
+def _people(size):
+    rng = _rng()
+    names = _words(rng, 100)
+    return [{'name': rng.choice(names), 'age': rng.randint(0, 99),
+             'town': rng.choice(['Bedrock', 'Rockvegas', 'Granite City'])}
+            for _ in range(size)]
+
+
+# mappings
+
+@case('mappings', 'to_dict')
+def _to_dict(size):
+    people = _people(size)
+    convert = mappings.to_dict({'who': mappings.lookup('name'),
+                                'old': lambda person: person['age'] > 60})
+    return lambda: list(map(convert, people))
+
+@case('mappings', 'map_values')
+def _map_values(size):
+    adict = dict((number, number) for number in range(size))
+    return lambda: mappings.map_values(str, adict)
+
+@case('mappings', 'filter_keys')
+def _filter_keys(size):
+    adict = dict((number, number) for number in range(size))
+    return lambda: mappings.filter_keys(lambda key: key % 3, adict)
+
+@case('mappings', 'row_to_dict')
+def _row_to_dict(size):
+    rows = [[number, str(number), float(number)] for number in range(size)]
+    convert = mappings.row_to_dict(['a', 'b', 'c'])
+    return lambda: list(map(convert, rows))
+
+
+# iterators
+
+_SIEVES = [('%d' % limit, op.lt(limit)) for limit in (10, 100, 1000, 10000, 100000)]
+_SIEVES.append(('rest', iterators.sift_rest))
+
+@case('iterators', 'partition_strict')
+def _partition_strict(size):
+    numbers = list(range(size))
+    return lambda: iterators.partition_strict(lambda num: num % 2, numbers)
+
+@case('iterators', 'sift (6 sieves)')
+def _sift(size):
+    rng = _rng()
+    numbers = [rng.randint(0, 200000) for _ in range(size)]
+    return lambda: [(label, list(matching))
+                    for label, matching in iterators.sift(_SIEVES, numbers)]
+
+@case('iterators', 'sift_strict (6 sieves)')
+def _sift_strict(size):
+    rng = _rng()
+    numbers = [rng.randint(0, 200000) for _ in range(size)]
+    return lambda: list(iterators.sift_strict(_SIEVES, numbers))
+
+@case('iterators', 'concat_map')
+def _concat_map(size):
+    numbers = list(range(size))
+    return lambda: list(iterators.concat_map(lambda num: (num, num), numbers))
+
+@case('iterators', 'at_least')
+def _at_least(size):
+    return lambda: iterators.at_least(size, iter(range(size)))
+
+
+# iterators.ordered
+
+@case('iterators.ordered', 'partition_o')
+def _partition_o(size):
+    numbers = list(range(size))
+    def run():
+        left, right = ordered.partition_o(op.lt(size // 2), numbers)
+        return list(left), list(right)
+    return run
+
+
+# lists
+
+@case('lists', 'categorise')
+def _categorise(size):
+    numbers = list(range(size))
+    split = lists.categorise([op.modulo(2), lambda num: num % 3 == 0])
+    return lambda: split(numbers)
+
+@case('lists', 'uncons view (x100)')
+def _uncons(size):
+    numbers = list(range(size))
+    def run():
+        tail = numbers
+        for _ in range(100):
+            head, tail = lists.uncons(tail, view=True)
+        return tail
+    return run
+
+@case('lists', 'all_but_last copy')
+def _all_but_last(size):
+    numbers = list(range(size))
+    return lambda: lists.all_but_last(1)(numbers)
+
+@case('lists', 'all_but_last view')
+def _all_but_last_view(size):
+    numbers = list(range(size))
+    return lambda: lists.all_but_last(1, view=True)(numbers)
+
+
+# maybe
+
+def _nested(size):
+    return [{'a': {'b': ' x%d ' % number}} if number % 10 else {}
+            for number in range(size)]
+
+@case('maybe', 'maybe_c map')
+def _maybe_c(size):
+    records = _nested(size)
+    pipeline = maybe.maybe_c(mappings.lookup('a'), mappings.lookup('b'),
+                             str.strip, str.upper)
+    return lambda: list(map(pipeline, records))
+
+@case('maybe', 'maybe_c apply_many')
+def _maybe_apply_many(size):
+    records = _nested(size)
+    pipeline = maybe.maybe_c(mappings.lookup('a'), mappings.lookup('b'),
+                             str.strip, str.upper)
+    return lambda: pipeline.apply_many(records)
+
+
+# op
+
+@case('op', 'filter lt')
+def _op_filter(size):
+    numbers = list(range(size))
+    return lambda: list(filter(op.lt(size // 2), numbers))
+
+@case('op', 'map composed')
+def _op_compose(size):
+    numbers = list(range(size))
+    return lambda: list(map(op.compose(op.add(1), op.mul(2)), numbers))
+
+@case('op', 'filter and-expression')
+def _op_and(size):
+    numbers = list(range(size))
+    return lambda: list(filter(op.gt(10) & op.lt(size - 10), numbers))
+
+if numpy is not None:
+    @case('op', 'apply_array')
+    def _op_apply_array(size):
+        numbers = numpy.arange(size)
+        return lambda: (op.gt(10) & op.lt(size - 10)).apply_array(numbers)
+
+
+# dates
+
+def _timestamps(size):
+    rng = _rng()
+    return ['%04d-%02d-%02d %02d:%02d:%02d' % (
+        rng.randint(1970, 2100), rng.randint(1, 12), rng.randint(1, 28),
+        rng.randint(0, 23), rng.randint(0, 59), rng.randint(0, 59))
+        for _ in range(size)]
+
+@case('dates', 'strptime')
+def _strptime(size):
+    stamps = _timestamps(size)
+    parse = dates.strptime('%Y-%m-%d %H:%M:%S')
+    return lambda: list(map(parse, stamps))
+
+@case('dates', 'convert_format')
+def _convert_format(size):
+    stamps = _timestamps(size)
+    convert = dates.convert_format('%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M')
+    return lambda: list(map(convert, stamps))
+
+@case('dates', 'strptime_many')
+def _strptime_many(size):
+    stamps = _timestamps(size)
+    return lambda: dates.strptime_many('%Y-%m-%d %H:%M:%S')(stamps)
+
+@case('dates', 'convert_format_many')
+def _convert_format_many(size):
+    stamps = _timestamps(size)
+    convert = dates.convert_format_many('%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M')
+    return lambda: convert(stamps)
+
+
+# strings
+
+def _lines(size, keywords):
+    rng = _rng()
+    vocabulary = _words(rng, 5000) + keywords[:50]
+    return [' '.join(rng.choice(vocabulary) for _ in range(12))
+            for _ in range(size)]
+
+@case('strings', 'KeywordMatcher.search')
+def _keyword_search(size):
+    keywords = _words(random.Random(7), 1000)
+    lines = _lines(size, keywords)
+    matcher = strings.KeywordMatcher(keywords)
+    return lambda: [line for line in lines if matcher.search(line)]
+
+@case('strings', 'count_words')
+def _count_words(size):
+    text = '\n'.join(_lines(size // 12 + 1, []))
+    return lambda: strings.count_words(io.StringIO(text))
+
+@case('strings', 'join_to bytearray')
+def _join_to(size):
+    words = _words(_rng(), size)
+    def run():
+        out = bytearray()
+        strings.join_to(' ', out)(words)
+        return out
+    return run
+
+@case('strings', 'words')
+def _string_words(size):
+    text = ' '.join(_words(_rng(), size))
+    return lambda: strings.words(text)
+
+
+# csv_records
+
+def _csv_rows(size):
+    rng = _rng()
+    names = _words(rng, 100)
+    return [[rng.choice(names), str(rng.randint(0, 99)),
+             '%.2f' % rng.random(), rng.choice(['a', 'b'])]
+            for _ in range(size)]
+
+@case('csv_records', 'load_columns')
+def _load_columns(size):
+    rows = _csv_rows(size)
+    spec = {'age': int, 'score': float}
+    keys = ['name', 'age', 'score', 'kind']
+    return lambda: csv_records.load_columns(rows, keys, spec)
+
+@case('csv_records', 'CSVPipeline.run')
+def _pipeline_run(size):
+    source = 'name,age,score,kind\n' + ''.join(
+        ','.join(row) + '\n' for row in _csv_rows(size))
+    pipeline = (csv_records.CSVPipeline()
+                .transform_column('name', str.title)
+                .add_column('next_age', lambda age: int(age) + 1, ['age'])
+                .drop_columns(['kind']))
+    def run():
+        destination = io.StringIO()
+        pipeline.run(io.StringIO(source), destination)
+        return destination
+    return run
+
+@case('csv_records', 'record_ranges')
+def _record_ranges(size):
+    data = ''.join('%s,"%s\n%s",%s\n' % tuple(row)
+                   for row in _csv_rows(size)).encode()
+    return lambda: list(csv_records.record_ranges(data, 65536))
@@ -0,0 +1,77 @@
+#! /usr/bin/env python
+
+"""Benchmark the per-call overhead of func.curry, flip and compose against
+hand-written closures, the old *args/**kwargs flip and functional.compose.
+
+Run from the top of the source tree:
+
+    python benchmarks/currying.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from funbox import func
+
+try:
+    from functional import compose as functional_compose
+except ImportError:
+    functional_compose = None
+
+
+def old_flip(function):
+    # func.flip as it was, forwarding *args/**kwargs at each level
+    def _flipped(*args_x, **kwargs_x):
+        def _flipped_inner(*args_y, **kwargs_y):
+            return function(*args_y, **kwargs_y)(*args_x, **kwargs_x)
+        return _flipped_inner
+    return _flipped
+
+
+def hand_curried(x):
+    return lambda y: x - y
+
+
+def subtract(x, y):
+    return x - y
+
+
+def increment(x):
+    return x + 1
+
+
+def main(number=200000, repeat=5):
+    curried = func.curry(subtract)
+    nested = increment
+    for _ in range(4):
+        nested = func.compose(increment, nested)
+    cases = [
+        ('closure: f(x)(y)', lambda: hand_curried(3)(2)),
+        ('curry: f(x)(y)', lambda: curried(3)(2)),
+        ('old flip: f(y)(x)', lambda: old_flip(hand_curried)(2)(3)),
+        ('flip: f(y)(x)', lambda: func.flip(hand_curried)(2)(3)),
+    ]
+    flipped_old = old_flip(hand_curried)(2)
+    flipped_new = func.flip(hand_curried)(2)
+    cases += [
+        ('old flip, applied', lambda: flipped_old(3)),
+        ('flip, applied', lambda: flipped_new(3)),
+        ('nested calls, 5 deep', lambda: increment(increment(increment(increment(increment(0)))))),
+        ('compose, nested 5 deep', lambda: nested(0)),
+    ]
+    if functional_compose is not None:
+        old_nested = increment
+        for _ in range(4):
+            old_nested = functional_compose(increment, old_nested)
+        cases.append(('functional.compose, 5 deep', lambda: old_nested(0)))
+    print('%d calls, best of %d, nanoseconds per call' % (number, repeat))
+    for label, case in cases:
+        best = min(timeit.repeat(case, number=number, repeat=repeat))
+        print('  %-30s %8.1f' % (label, best / number * 1e9))
+
+
+if __name__ == '__main__':
+    main()
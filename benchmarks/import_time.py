@@ -0,0 +1,52 @@
+#! /usr/bin/env python
+
+"""Benchmark how long it takes to import funbox and its modules, each in a
+fresh interpreter, and which heavy modules come in with them.
+
+Run from the top of the source tree:
+
+    python benchmarks/import_time.py
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+MODULES = [
+    'funbox', 'funbox.mappings', 'funbox.dates', 'funbox.once', 'funbox.op',
+    'funbox.passthrough', 'funbox.maybe', 'funbox.lists', 'funbox.csv_records',
+    'funbox.strings', 'funbox.iterators',
+]
+
+HEAVY = ['numpy', 'functional', 'logging', 'concurrent.futures']
+
+SCRIPT = '''
+import sys, time
+started = time.perf_counter()
+import %s
+elapsed = time.perf_counter() - started
+print(elapsed)
+print(' '.join(name for name in %r if name in sys.modules))
+'''
+
+
+def time_import(module):
+    output = subprocess.check_output(
+        [sys.executable, '-c', SCRIPT % (module, HEAVY)], cwd=ROOT,
+        universal_newlines=True)
+    elapsed, heavy = output.split('\n')[:2]
+    return float(elapsed), heavy
+
+
+def main(repeat=5):
+    print('Best of %d fresh interpreters, milliseconds' % repeat)
+    for module in MODULES:
+        timings = [time_import(module) for _ in range(repeat)]
+        best = min(elapsed for elapsed, heavy in timings)
+        print('  %-22s %8.2f  %s' % (module, best * 1000, timings[0][1]))
+
+
+if __name__ == '__main__':
+    main()
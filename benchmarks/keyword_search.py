@@ -0,0 +1,53 @@
+#! /usr/bin/env python
+
+"""Benchmark strings.KeywordMatcher against 'in' tests and a regex.
+
+Run from the top of the source tree:
+
+    python benchmarks/keyword_search.py
+"""
+
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from funbox.strings import KeywordMatcher
+
+
+def make_data(keyword_count, line_count, seed=42):
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    word = lambda: ''.join(rng.choice(letters) for _ in range(rng.randint(4, 9)))
+    keywords = list(set(word() for _ in range(keyword_count)))
+    vocabulary = [word() for _ in range(5000)] + keywords[:50]
+    lines = [' '.join(rng.choice(vocabulary) for _ in range(12))
+             for _ in range(line_count)]
+    return keywords, lines
+
+
+def main(keyword_counts=(10, 100, 1000, 5000), line_count=2000, repeat=3):
+    for keyword_count in keyword_counts:
+        keywords, lines = make_data(keyword_count, line_count)
+        matcher = KeywordMatcher(keywords)
+        alternation = re.compile('|'.join(map(re.escape, keywords)))
+        words_re = re.compile(r'\w+')
+        keyword_set = frozenset(keywords)
+        cases = [
+            ("'in' tests", lambda: [l for l in lines if any(k in l for k in keywords)]),
+            ('regex alternation', lambda: [l for l in lines if alternation.search(l)]),
+            ('KeywordMatcher.search', lambda: [l for l in lines if matcher.search(l)]),
+            ('words & keyword set', lambda: [l for l in lines
+                                             if not keyword_set.isdisjoint(words_re.findall(l))]),
+        ]
+        print('%d keywords, %d lines, best of %d' % (len(keywords), line_count, repeat))
+        for label, case in cases:
+            best = min(timeit.repeat(case, number=1, repeat=repeat))
+            print('  %-24s %.4fs' % (label, best))
+
+
+if __name__ == '__main__':
+    main()
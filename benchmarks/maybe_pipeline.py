@@ -0,0 +1,57 @@
+#! /usr/bin/env python
+
+"""Benchmark compiled maybe_c pipelines against the old closure version.
+
+Run from the top of the source tree:
+
+    python benchmarks/maybe_pipeline.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from funbox.maybe import maybe_c, odoo_maybe_c
+from funbox.mappings import lookup
+
+
+def _old_gen_maybe(nulls, value, functions):
+    for fun in functions:
+        if value in nulls:
+            return value
+        else:
+            value = fun(value)
+    return value
+
+def old_maybe_c(*functions):
+    return lambda value: _old_gen_maybe((None,), value, functions)
+
+def old_odoo_maybe_c(*functions):
+    return lambda value: _old_gen_maybe((None, False), value, functions)
+
+
+def main(size=100000, repeat=5):
+    records = [{'a': {'b': ' x%d ' % i}} if i % 10 else {} for i in range(size)]
+    functions = (lookup('a'), lookup('b'), str.strip, str.upper)
+    cases = [
+        ('old maybe_c', old_maybe_c(*functions)),
+        ('maybe_c', maybe_c(*functions)),
+        ('old odoo_maybe_c', old_odoo_maybe_c(*functions)),
+        ('odoo_maybe_c', odoo_maybe_c(*functions)),
+    ]
+    print('%d records, best of %d' % (size, repeat))
+    for label, pipeline in cases:
+        best = min(timeit.repeat(lambda: list(map(pipeline, records)),
+                                 number=1, repeat=repeat))
+        print('%-26s %.4fs' % (label + ' (map)', best))
+        apply_many = getattr(pipeline, 'apply_many', None)
+        if apply_many is not None:
+            best = min(timeit.repeat(lambda: apply_many(records),
+                                     number=1, repeat=repeat))
+            print('%-26s %.4fs' % (label + ' (apply_many)', best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Registering, measuring and comparing benchmark cases.
+"""
+
+import gc
+import json
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+
+
+CASES = []
+
+
+class Case(object):
+    """A benchmark of one thing, at any input size.
+
+    setup(size) does any preparation, and returns a function of no
+    arguments which runs the thing being measured once and returns its
+    result.
+    """
+    __slots__ = ('module', 'name', 'setup')
+
+    def __init__(self, module, name, setup):
+        self.module = module
+        self.name = name
+        self.setup = setup
+
+    def __repr__(self):
+        return 'Case(%r, %r)' % (self.module, self.name)
+
+
+def case(module, name):
+    """Decorator registering a setup function as a Case.
+    """
+    def register(setup):
+        CASES.append(Case(module, name, setup))
+        return setup
+    return register
+
+
+def measure(case, size, repeat=3, min_time=0.1):
+    """Run a case at one size and return a dict of its figures.
+
+    seconds: Best time for one run, over repeat rounds of enough runs to
+             take min_time.
+    peak_bytes: Most memory allocated at once during a run, less whatever
+                was allocated before it.
+    retained_blocks: Change in sys.getallocatedblocks() over a run, which is
+                     the number of memory blocks it leaves allocated,
+                     including its result.  This isn't a count of all the
+                     allocations it makes, which may have been freed.
+    """
+    run = case.setup(size)
+    run()
+    timer = timeit.Timer(run)
+    number = 1
+    while True:
+        taken = timer.timeit(number)
+        if taken >= min_time or number >= 1 << 20:
+            break
+        number *= 10 if taken < min_time / 10 else 2
+    seconds = min([taken] + timer.repeat(repeat - 1, number)) / number
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        retained_blocks = sys.getallocatedblocks()
+        result = run()
+        retained_blocks = sys.getallocatedblocks() - retained_blocks
+        peak_bytes = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return {
+        'module': case.module,
+        'case': case.name,
+        'size': size,
+        'seconds': seconds,
+        'peak_bytes': peak_bytes,
+        'retained_blocks': retained_blocks,
+    }
+
+
+def run_suite(cases, sizes, repeat=3, report=None):
+    """Measure every case at every size, returning the results document.
+
+    report: Called with each result as it's measured.
+    """
+    results = []
+    for size in sizes:
+        for bench in cases:
+            result = measure(bench, size, repeat)
+            results.append(result)
+            if report is not None:
+                report(result)
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+
+def save(document, path):
+    with open(path, 'w') as outfile:
+        json.dump(document, outfile, indent=1, sort_keys=True)
+        outfile.write('\n')
+
+
+def load(path):
+    with open(path) as infile:
+        return json.load(infile)
+
+
+def compare(document, baseline, tolerance=0.25, min_bytes=65536):
+    """Compare results with a baseline.
+
+    Returns a list of (result, time ratio, memory ratio, regressed) for the
+    results which are in the baseline.  A case regressed if it takes more
+    than 1 + tolerance times as long, or its peak memory grew by that much
+    and by at least min_bytes (to ignore noise in small figures).
+    """
+    base = dict(((result['module'], result['case'], result['size']), result)
+                for result in baseline['results'])
+    compared = []
+    for result in document['results']:
+        old = base.get((result['module'], result['case'], result['size']))
+        if old is None:
+            continue
+        time_ratio = result['seconds'] / old['seconds'] if old['seconds'] else 1.0
+        memory_ratio = ((result['peak_bytes'] / float(old['peak_bytes']))
+                        if old['peak_bytes'] else 1.0)
+        regressed = (time_ratio > 1 + tolerance
+                     or (memory_ratio > 1 + tolerance
+                         and result['peak_bytes'] - old['peak_bytes'] >= min_bytes))
+        compared.append((result, time_ratio, memory_ratio, regressed))
+    return compared
+
+
+def format_result(result):
+    return '%-18s %-26s %9d %12s %12s %15d' % (
+        result['module'], result['case'], result['size'],
+        format_seconds(result['seconds']), format_bytes(result['peak_bytes']),
+        result['retained_blocks'])
+
+
+HEADING = '%-18s %-26s %9s %12s %12s %15s' % (
+    'module', 'case', 'size', 'time', 'peak memory', 'retained blocks')
+
+
+def format_seconds(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return '%.2f%s' % (seconds / scale, unit)
+    return '%.0fns' % (seconds / 1e-9)
+
+
+def format_bytes(count):
+    for unit, scale in (('MiB', 1 << 20), ('KiB', 1 << 10)):
+        if abs(count) >= scale:
+            return '%.1f%s' % (count / float(scale), unit)
+    return '%dB' % count
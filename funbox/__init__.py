@@ -35,3 +35,25 @@ in 'functools':
 >>> list(map(partial(multiply, 2), [1, 2, 3, 4, 5]))
 [2, 4, 6, 8, 10]
 """
+
+import importlib as _importlib
+
+# Submodules are imported when first used as attributes of the package, so
+# import funbox is cheap and funbox.mappings etc. still work without an
+# explicit import of each one.
+_SUBMODULES = frozenset([
+    'cmdline_parsing', 'csv_records', 'dates', 'flogic', 'func',
+    'instrument', 'iterators', 'itertools_compat', 'lists', 'mappings',
+    'maybe', 'misc', 'once', 'op', 'pairs', 'passthrough', 'sinks',
+    'strings', 'validation',
+])
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return _importlib.import_module('.' + name, __name__)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES)
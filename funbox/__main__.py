@@ -0,0 +1,352 @@
+#! /usr/bin/env python
+
+"""Run a streaming pipeline of funbox functions over records on stdin.
+
+    python -m funbox [options] STAGE...
+
+Records are read from stdin as JSON lines (the default) or CSV, passed
+through the stages in order, and written to stdout in the same format.
+
+Stages:
+
+    --map EXPR              Replace each record with EXPR(record).
+    --filter EXPR           Keep only records where EXPR(record) is true.
+    --partition EXPR PATH   Like partition: records where EXPR(record) is
+                            true carry on, the rest are written to PATH.
+    --sift EXPR PATH        Like one sieve of sift: records where
+                            EXPR(record) is true are written to PATH, the
+                            rest carry on.  Give several in a row to sift
+                            into several files.
+
+EXPR is a Python expression for a one-argument function.  The funbox
+modules (op, mappings, maybe, passthrough, flogic, ...) can be used by
+name, and compose is op.compose, so for example:
+
+    python -m funbox --filter 'compose(op.ge(18), mappings.lookup("age"))' \\
+        --map 'mappings.lookup("name")' < people.jsonl
+
+Memory use is constant: records are handled in chunks of --chunk-size,
+with I/O in --buffer-size blocks.  With --workers, chunks are processed in
+a pool of that many processes, still in order.  Throughput figures are
+printed on stderr at the end, unless --quiet is given.
+
+>>> import io
+>>> stdin = io.BytesIO(b'{"name": "fred", "age": 43}\\n{"name": "pebbles", "age": 2}\\n')
+>>> stdout = io.BytesIO()
+>>> main(['--filter', 'compose(op.ge(18), mappings.lookup("age"))',
+...       '--map', 'lambda record: record["name"].upper()', '--quiet'],
+...      stdin=stdin, stdout=stdout)
+0
+>>> print(stdout.getvalue().decode())
+"FRED"
+<BLANKLINE>
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import json
+import sys
+import time
+import types
+
+from . import _lazy
+from . import _SUBMODULES
+from .cmdline_parsing import arg_is_natural_num
+from .sinks import JoinSink
+from ._lazy import futures as _futures
+
+def main(argv=None, stdin=None, stdout=None, stderr=None):
+    """Run the command line in argv (default sys.argv[1:]).
+
+    Returns the exit status.
+    """
+    parser = _parser()
+    options = parser.parse_args(argv)
+    stages = [tuple(stage) for stage in options.stages or []]
+    stderr = stderr or sys.stderr
+    try:
+        for stage in stages:
+            _compile_expression(stage[1])
+    except Exception as error:
+        parser.error("bad expression %r: %s" % (stage[1], error))
+    started = time.time()
+    source = _reopen(stdin or getattr(sys.stdin, 'buffer', sys.stdin), 'rb',
+                     options.buffer_size)
+    target = stdout or getattr(sys.stdout, 'buffer', sys.stdout)
+    try:
+        if options.format == 'csv':
+            text = io.TextIOWrapper(source, encoding=options.encoding,
+                                    newline='')
+            items = csv.reader(text)
+            header = next(items, None) if options.header else None
+        else:
+            items = (line for line in source if not line.isspace())
+            header = None
+        fields = options.fields.split(',') if options.fields else header
+        if options.to == 'csv' and options.format == 'jsonl' and not fields:
+            parser.error("--to csv needs --fields for JSON input")
+        spec = (tuple(stages), options.format, options.to or options.format,
+                tuple(header) if header else None,
+                tuple(fields) if fields else None, options.encoding)
+        paths = [stage[2] for stage in stages if len(stage) > 2]
+        counts = _run(spec, items, target, paths, options)
+    except ValueError as error:
+        stderr.write('funbox: error: %s\n' % (error,))
+        return 1
+    if not options.quiet:
+        _report(stderr, counts, ['<stdout>'] + paths, time.time() - started)
+    return 0
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m funbox',
+        description="Run a streaming pipeline of funbox functions over "
+                    "records on stdin.")
+    stage = parser.add_argument_group('stages, run in the order given')
+    stage.add_argument('--map', dest='stages', action=_Stage, metavar='EXPR')
+    stage.add_argument('--filter', dest='stages', action=_Stage, metavar='EXPR')
+    stage.add_argument('--partition', dest='stages', action=_Stage, nargs=2,
+                       metavar=('EXPR', 'PATH'))
+    stage.add_argument('--sift', dest='stages', action=_Stage, nargs=2,
+                       metavar=('EXPR', 'PATH'))
+    parser.add_argument('--format', choices=('jsonl', 'csv'), default='jsonl',
+                        help="input format (default jsonl)")
+    parser.add_argument('--to', choices=('jsonl', 'csv'),
+                        help="output format (default the input format)")
+    parser.add_argument('--no-header', dest='header', action='store_false',
+                        help="CSV input has no header row, so records are "
+                             "lists rather than dicts")
+    parser.add_argument('--fields',
+                        help="comma-separated CSV output columns (default "
+                             "the input's)")
+    parser.add_argument('--encoding', default='utf-8')
+    parser.add_argument('--workers', type=_natural, default=0,
+                        help="process chunks in this many processes "
+                             "(default 0, in this process)")
+    parser.add_argument('--chunk-size', type=_natural, default=1000,
+                        help="records per chunk (default 1000)")
+    parser.add_argument('--buffer-size', type=_natural, default=1 << 20,
+                        help="I/O buffer size in bytes (default 1MiB)")
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="don't print throughput figures on stderr")
+    return parser
+
+
+class _Stage(argparse.Action):
+    """Collects all the stage options in one list, in command line order.
+    """
+    def __call__(self, parser, namespace, values, option_string=None):
+        if isinstance(values, str):
+            values = [values]
+        stages = getattr(namespace, self.dest) or []
+        stages.append([option_string.lstrip('-')] + list(values))
+        setattr(namespace, self.dest, stages)
+
+
+def _natural(arg):
+    if not arg_is_natural_num(arg):
+        raise argparse.ArgumentTypeError("%r isn't a natural number" % (arg,))
+    return int(arg)
+
+
+def _run(spec, items, target, paths, options):
+    """Run the chunks of items through the pipeline and write the results.
+
+    Returns the number of records read and a list of the number written to
+    each output.
+    """
+    sinks = [JoinSink(target, '\n', terminate=True,
+                      buffer_size=options.buffer_size,
+                      encoding=options.encoding)]
+    files = [open(path, 'wb') for path in paths]
+    sinks += [JoinSink(outfile, '\n', terminate=True,
+                       buffer_size=options.buffer_size,
+                       encoding=options.encoding) for outfile in files]
+    try:
+        fields = spec[4]
+        headings = 0
+        if spec[2] == 'csv' and fields:
+            heading = _CSVEncoder(None).encode(list(fields))
+            for sink in sinks:
+                sink.write(heading)
+            headings = 1
+        size = max(options.chunk_size, 1)
+        chunks = iter(lambda: list(itertools.islice(items, size)), [])
+        read = [0]
+        def counted(chunks):
+            for chunk in chunks:
+                read[0] += len(chunk)
+                yield chunk
+        if options.workers:
+            results = _process_parallel(spec, counted(chunks), options.workers)
+        else:
+            process = _processor(spec)
+            results = (process(chunk) for chunk in counted(chunks))
+        for outputs in results:
+            for sink, lines in zip(sinks, outputs):
+                if lines:
+                    sink.write_many(lines)
+    finally:
+        for sink in sinks:
+            sink.close()
+        for outfile in files:
+            outfile.close()
+    return read[0], [sink.records - headings for sink in sinks]
+
+
+def _process_parallel(spec, chunks, workers):
+    """Generate the results of processing chunks in a process pool, in
+    order, with at most two chunks per worker in flight.
+    """
+    if not _lazy.available(_futures):
+        raise ValueError("--workers needs concurrent.futures")
+    pool = _futures.ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = []
+        for chunk in chunks:
+            pending.append(pool.submit(_process_chunk, spec, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+    finally:
+        pool.shutdown()
+
+
+_PROCESSORS = {}
+
+def _process_chunk(spec, chunk):
+    # Run in the worker processes, which build the pipeline once each
+    process = _PROCESSORS.get(spec)
+    if process is None:
+        process = _PROCESSORS[spec] = _processor(spec)
+    return process(chunk)
+
+
+def _processor(spec):
+    """Generate the function which runs a chunk of input items through the
+    stages, returning a list of encoded lines for each output.
+    """
+    stages, in_format, out_format, header, fields, encoding = spec
+    namespace = {
+        '_loads': json.JSONDecoder().decode,
+        '_dumps': json.JSONEncoder().encode,
+        '_encode_csv': _CSVEncoder(fields).encode,
+        '_header': header,
+    }
+    if in_format == 'jsonl':
+        decode = '_loads(item.decode(%r))' % (encoding,)
+    elif header is not None:
+        decode = 'dict(zip(_header, item))'
+    else:
+        decode = 'item'
+    encode = '_dumps(record)' if out_format == 'jsonl' else '_encode_csv(record)'
+    outputs = 1 + sum(1 for stage in stages if len(stage) > 2)
+    lines = ['def process_chunk(items):']
+    lines += ['    out%d = []' % index for index in range(outputs)]
+    lines += ['    append%d = out%d.append' % (index, index)
+              for index in range(outputs)]
+    lines += ['    for item in items:',
+              '        record = %s' % decode]
+    diverted = 0
+    for index, stage in enumerate(stages):
+        name = '_stage%d' % index
+        namespace[name] = _compile_expression(stage[1])
+        kind = stage[0]
+        if kind == 'map':
+            lines.append('        record = %s(record)' % name)
+        elif kind == 'filter':
+            lines.append('        if not %s(record):' % name)
+            lines.append('            continue')
+        else:
+            diverted += 1
+            test = 'not %s(record)' if kind == 'partition' else '%s(record)'
+            lines.append('        if %s:' % (test % name))
+            lines.append('            append%d(%s)' % (diverted, encode))
+            lines.append('            continue')
+    lines += ['        append0(%s)' % encode,
+              '    return [%s]' % ', '.join('out%d' % index
+                                           for index in range(outputs)),
+              '']
+    exec('\n'.join(lines), namespace)
+    return namespace['process_chunk']
+
+
+def _compile_expression(expression):
+    """Evaluate a stage expression, importing any funbox modules it names.
+    """
+    code = compile(expression, '<stage>', 'eval')
+    namespace = {'compose': _module('op').compose}
+    for name in _names(code):
+        if name in _SUBMODULES:
+            namespace[name] = _module(name)
+    function = eval(code, namespace)
+    if not callable(function):
+        raise TypeError("%r isn't callable" % (function,))
+    return function
+
+
+def _names(code):
+    names = set(code.co_names)
+    for constant in code.co_consts:
+        if isinstance(constant, types.CodeType):
+            names |= _names(constant)
+    return names
+
+
+def _module(name):
+    package = sys.modules[__package__ or 'funbox']
+    return getattr(package, name)
+
+
+class _CSVEncoder(object):
+    """Encodes a record as a line of CSV, without the line ending.
+
+    Dict records are written in the order of fields.
+    """
+    def __init__(self, fields):
+        self._lines = []
+        # csv only quotes newlines when they're in the line terminator
+        writer = csv.writer(self, lineterminator='\n')
+        if fields is not None:
+            self._write = csv.DictWriter(self, fields, extrasaction='ignore',
+                                         lineterminator='\n').writerow
+            self._write_row = writer.writerow
+        else:
+            self._write = self._write_row = writer.writerow
+
+    def write(self, line):
+        self._lines.append(line)
+
+    def encode(self, record):
+        if isinstance(record, dict):
+            self._write(record)
+        else:
+            self._write_row(record)
+        return self._lines.pop()[:-1]
+
+
+def _reopen(stream, mode, buffer_size):
+    """Reopen a standard stream's file descriptor with a bigger buffer.
+    """
+    try:
+        return io.open(stream.fileno(), mode, buffering=buffer_size,
+                       closefd=False)
+    except (AttributeError, io.UnsupportedOperation, OSError):
+        return stream
+
+
+def _report(stderr, counts, names, elapsed):
+    read, written = counts
+    rate = read / elapsed if elapsed else 0.0
+    stderr.write('funbox: %d records in %.3fs, %.0f records/s\n'
+                 % (read, elapsed, rate))
+    for name, count in zip(names, written):
+        stderr.write('funbox:   %d to %s\n' % (count, name))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+#! /usr/bin/env python
+
+"""Lazy imports of optional and slow-to-import dependencies.
+
+Importing NumPy takes longer than importing all of funbox, and
+concurrent.futures brings in logging and threading, so modules which use
+them use the stand-ins here, which only import the real module the first
+time one of its attributes is used.
+
+>>> is_ndarray([1, 2, 3])
+False
+>>> available(LazyModule('no_such_module_here'))
+False
+"""
+
+import importlib
+import sys
+
+
+class LazyModule(object):
+    """Stands in for a module, importing it when an attribute is first used.
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._error = None
+
+    def _load(self):
+        if self._module is None:
+            if self._error is not None:
+                raise self._error
+            try:
+                self._module = importlib.import_module(self._name)
+            except ImportError as error:
+                self._error = error
+                raise
+        return self._module
+
+    def __getattr__(self, attr):
+        if attr.startswith('__'):
+            # Introspection (doctest, inspect, copy) shouldn't import it
+            raise AttributeError(attr)
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        return '<lazy module %r>' % self._name
+
+
+numpy = LazyModule('numpy')
+futures = LazyModule('concurrent.futures')
+
+
+def available(module):
+    """Return whether a LazyModule can be imported, importing it if necessary.
+    """
+    try:
+        module._load()
+    except ImportError:
+        return False
+    return True
+
+
+def has_numpy():
+    return available(numpy)
+
+
+def is_ndarray(value):
+    """Return whether value is a NumPy array, without importing NumPy.
+
+    If nothing has imported NumPy yet, value can't be one of its arrays.
+    """
+    module = sys.modules.get('numpy')
+    return module is not None and isinstance(value, module.ndarray)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
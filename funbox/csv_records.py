@@ -3,12 +3,26 @@
 """Tools for transforming CSV records and lists of CSV records.
 """
 
+import array
+import collections
+import csv
+import itertools
+import io
+import mmap
+import os
+import operator
+import time
+
 try:
     from itertools import izip
 except ImportError:
     # For Python 3 compatibility
     izip = zip
 
+from . import _lazy
+from ._lazy import futures as _futures
+from ._lazy import numpy as _numpy
+
 def add_column(existing_rows, new_column):
     """Take an existing iterable of rows, and add a new column of data to it.
 
@@ -16,11 +30,502 @@ def add_column(existing_rows, new_column):
     >>> gender_column = ['male', 'female']
     >>> list(add_column(old, gender_column))
     [['fred', 43, 'male'], ['wilma', 34, 'female']]
+    >>> old
+    [['fred', 43], ['wilma', 34]]
+
+    To add several columns to a whole file in one pass, see CSVPipeline.
     """
     for row, new_field in izip(existing_rows, new_column):
-        row_copy = row[:]
-        row_copy.append(new_field)
-        yield row_copy
+        # One allocation, rather than a copy followed by a resizing append
+        yield row + [new_field]
+
+
+class CSVPipeline(object):
+    """A streaming transform over CSV rows.
+
+    Add, transform and drop columns, then run the lot over a file in one
+    pass.  Each row read by the csv module is a fresh list, so the steps
+    work on it in place rather than copying it at every stage, and dropped
+    columns are only left out when the row is written.  Only one row is in
+    memory at a time.
+
+    Columns can be referred to by name if the input has a header row,
+    or by position.
+
+    >>> import io
+    >>> source = io.StringIO('name,age,town\\nfred,43,Bedrock\\nwilma,34,Bedrock\\n')
+    >>> destination = io.StringIO()
+    >>> pipeline = (CSVPipeline()
+    ...     .transform_column('name', str.title)
+    ...     .add_column('age_next_year', lambda age: int(age) + 1, ['age'])
+    ...     .drop_columns(['town']))
+    >>> pipeline.run(source, destination)
+    2
+    >>> print(destination.getvalue().replace('\\r\\n', '\\n'))
+    name,age,age_next_year
+    Fred,43,44
+    Wilma,34,35
+    <BLANKLINE>
+    >>> pipeline.rows
+    2
+    """
+    def __init__(self):
+        self._steps = []
+        self.rows = 0
+        self.elapsed = 0.0
+
+    def add_column(self, name, function, inputs=None):
+        """Append a column calculated by function.
+
+        inputs: Names or positions of the columns whose values are passed to
+                function as positional arguments.  If None, function gets
+                the whole row as a list.
+        """
+        self._steps.append(('add', name, function, inputs))
+        return self
+
+    def transform_column(self, column, function):
+        """Replace the value in column with function(value).
+        """
+        self._steps.append(('transform', column, function, None))
+        return self
+
+    def drop_columns(self, columns):
+        """Leave the given columns out of the output.
+        """
+        for column in columns:
+            self._steps.append(('drop', column, None, None))
+        return self
+
+    def compile(self, header):
+        """Return (process, out_header) for input with the given header.
+
+        process(row) transforms a row list in place and returns the output
+        row.  header can be None if columns are only referred to by position,
+        in which case out_header is None too.
+        """
+        names = list(header) if header is not None else None
+        width = len(names) if names is not None else None
+        dropped = set()
+        actions = []
+
+        def index_of(column):
+            if isinstance(column, int):
+                return column
+            if names is None:
+                raise ValueError("no header, so refer to column %r by position"
+                                 % (column,))
+            try:
+                position = names.index(column)
+            except ValueError:
+                raise ValueError("no such column %r" % (column,))
+            if position in dropped:
+                raise ValueError("column %r has been dropped" % (column,))
+            return position
+
+        for kind, column, function, inputs in self._steps:
+            if kind == 'add':
+                if inputs is None:
+                    actions.append(_adder(function))
+                else:
+                    actions.append(_adder(
+                        function, operator.itemgetter(*map(index_of, inputs)),
+                        len(inputs) == 1))
+                if names is not None:
+                    names.append(column)
+            elif kind == 'transform':
+                actions.append(_transformer(index_of(column), function))
+            else:
+                dropped.add(index_of(column))
+
+        if dropped:
+            if names is None:
+                raise ValueError("dropping columns needs a header row")
+            keep = [i for i in range(len(names)) if i not in dropped]
+            project = operator.itemgetter(*keep)
+            out_header = [names[i] for i in keep]
+            if len(keep) == 1:
+                single = project
+                project = lambda row: (single(row),)
+        else:
+            project = None
+            out_header = names
+
+        def process(row):
+            for action in actions:
+                action(row)
+            return row if project is None else project(row)
+        return process, out_header
+
+    def transform_rows(self, rows, header=None):
+        """Generate transformed rows from an iterable of row lists.
+
+        The row lists are modified in place.
+        """
+        process = self.compile(header)[0]
+        for row in rows:
+            yield process(row)
+
+    def run(self, source, destination, header=True, buffer_size=1 << 20,
+            encoding='utf-8', **csv_options):
+        """Run the pipeline from source to destination.
+
+        source, destination: File names, or open text files.
+        header: Whether the source has a header row.
+        buffer_size: Buffer size for files we open.
+        csv_options: Passed to csv.reader and csv.writer.
+
+        Returns the number of data rows written.
+        """
+        started = time.time()
+        infile = _open(source, 'r', buffer_size, encoding)
+        try:
+            outfile = _open(destination, 'w', buffer_size, encoding)
+            try:
+                reader = csv.reader(infile, **csv_options)
+                writer = csv.writer(outfile, **csv_options)
+                in_header = next(reader, None) if header else None
+                process, out_header = self.compile(in_header)
+                if out_header is not None:
+                    writer.writerow(out_header)
+                counter = _Counter()
+                writer.writerows(counter.count(process, reader))
+            finally:
+                if outfile is not destination:
+                    outfile.close()
+        finally:
+            if infile is not source:
+                infile.close()
+        self.rows += counter.rows
+        self.elapsed += time.time() - started
+        return counter.rows
+
+    def rows_per_second(self):
+        """Throughput of the runs so far.
+        """
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def read_csv_parallel(path, chunk_size=1 << 24, max_workers=None,
+                      ordered=True, encoding='utf-8', executor=None,
+                      **csv_options):
+    r"""Generate the rows of a CSV file, parsing chunks of it in parallel.
+
+    The file is memory-mapped and split into byte ranges of roughly
+    chunk_size, aligned to record boundaries (newlines outside quotes),
+    which are parsed by a process pool.
+
+    ordered: Yield rows in file order.  If False, each chunk's rows are
+             yielded as soon as the chunk is parsed.
+    executor: A concurrent.futures executor to use instead of making a
+              ProcessPoolExecutor with max_workers.
+    max_workers: Also sets how many chunks are queued at once (twice this),
+                 defaulting to the number of CPUs.
+    csv_options: Passed to csv.reader.  Only a quotechar-doubling dialect
+                 is supported (not escapechar) and records must end in
+                 '\n' or '\r\n'.  With quotechar=None or
+                 quoting=csv.QUOTE_NONE, every newline ends a record.
+
+    The header row (if any) is just the first row, so with ordered=True it
+    works with the other record helpers:
+
+    >>> import os, tempfile
+    >>> from .mappings import row_to_dict
+    >>> handle, path = tempfile.mkstemp(suffix='.csv')
+    >>> with os.fdopen(handle, 'w') as f:
+    ...     _ = f.write('id,note\n1,plain\n2,"two\nlines"\n3,"say ""hi"" twice"\n')
+    >>> from concurrent.futures import ThreadPoolExecutor
+    >>> with ThreadPoolExecutor(2) as executor:
+    ...     rows = read_csv_parallel(path, chunk_size=8, executor=executor)
+    ...     keys = next(rows)
+    ...     records = list(map(row_to_dict(keys), rows))
+    >>> [(r['id'], r['note']) for r in records]
+    [('1', 'plain'), ('2', 'two\nlines'), ('3', 'say "hi" twice')]
+    >>> os.remove(path)
+    """
+    quotechar = csv_options.get('quotechar', '"')
+    if quotechar is None or csv_options.get('quoting') == csv.QUOTE_NONE:
+        quotechar = None
+    else:
+        quotechar = quotechar.encode('ascii')
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            ranges = record_ranges(mapped, chunk_size, quotechar)
+        finally:
+            mapped.close()
+    own_executor = executor is None
+    if own_executor:
+        if not _lazy.available(_futures):
+            raise RuntimeError("read_csv_parallel needs concurrent.futures")
+        executor = _futures.ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        window = 2 * (max_workers or os.cpu_count() or 4)
+        pending = collections.deque()
+        ranges = iter(ranges)
+        for start, end in ranges:
+            pending.append(executor.submit(
+                _parse_range, path, start, end, encoding, csv_options))
+            if len(pending) >= window:
+                break
+        while pending:
+            if ordered:
+                done = pending.popleft()
+            else:
+                done = next(_futures.as_completed(pending))
+                pending.remove(done)
+            for start, end in ranges:
+                pending.append(executor.submit(
+                    _parse_range, path, start, end, encoding, csv_options))
+                break
+            for row in done.result():
+                yield row
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+def record_ranges(buf, chunk_size, quotechar=b'"'):
+    r"""Split a buffer of CSV data into (start, end) ranges of whole records.
+
+    Each range is at least chunk_size bytes (bar the last), and ends just
+    after a newline which isn't inside quotes.  Quote parity is tracked by
+    counting quote characters, which handles doubled quotes too.  If
+    quotechar is None, any newline will do.
+
+    >>> data = b'a,b\n"x\ny",z\n"q""r",s\n'
+    >>> record_ranges(data, 5)
+    [(0, 12), (12, 21)]
+    >>> [data[start:end] for start, end in record_ranges(data, 1)][1]
+    b'"x\ny",z\n'
+    >>> record_ranges(data, 5, quotechar=None)
+    [(0, 7), (7, 21)]
+    """
+    size = len(buf)
+    ranges = []
+    start = 0
+    while start < size:
+        end = _next_boundary(buf, start, min(start + chunk_size, size), quotechar)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+def _next_boundary(buf, start, nominal, quotechar, slab=1 << 24):
+    """Find the first unquoted newline at or after nominal.
+
+    start must be a record boundary.
+    """
+    if quotechar is None:
+        newline = buf.find(b'\n', nominal)
+        return len(buf) if newline == -1 else newline + 1
+    quotes = 0
+    for position in range(start, nominal, slab):
+        quotes += buf[position:min(position + slab, nominal)].count(quotechar)
+    position = nominal
+    while True:
+        newline = buf.find(b'\n', position)
+        if newline == -1:
+            return len(buf)
+        quotes += buf[position:newline].count(quotechar)
+        if quotes % 2 == 0:
+            return newline + 1
+        position = newline + 1
+
+def _parse_range(path, start, end, encoding, csv_options):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode(encoding)
+    return list(csv.reader(io.StringIO(text, newline=''), **csv_options))
+
+# Coercion functions whose results can be stored in an array.array
+_TYPECODES = {int: 'q', float: 'd'}
+
+class Columns(object):
+    """Typed columns of CSV data, as loaded by load_columns.
+
+    Index by key name to get a column.  Numeric columns are NumPy arrays if
+    NumPy is available (and wanted), otherwise array.array, and other
+    columns are lists.
+
+    >>> rows = [['fred', '43', '1.5'], ['wilma', '34', '2.0']]
+    >>> cols = load_columns(rows, ['name', 'age', 'score'],
+    ...                     {'age': int, 'score': float}, use_numpy=False)
+    >>> len(cols), cols.keys
+    (2, ['name', 'age', 'score'])
+    >>> cols['age']
+    array('q', [43, 34])
+    >>> cols['name']
+    ['fred', 'wilma']
+    >>> [sorted(d.items()) for d in cols.to_dicts()]
+    [[('age', 43), ('name', 'fred'), ('score', 1.5)], [('age', 34), ('name', 'wilma'), ('score', 2.0)]]
+    """
+    def __init__(self, keys, columns):
+        self.keys = list(keys)
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns[self.keys[0]]) if self.keys else 0
+
+    def __getitem__(self, key):
+        return self.columns[key]
+
+    def to_dicts(self):
+        """Generate a dict per row, as row_to_dict would give after
+        coerce_values.
+        """
+        keys = self.keys
+        values = [_python_values(self.columns[key]) for key in keys]
+        for row in izip(*values):
+            yield dict(izip(keys, row))
+
+def load_columns(rows, keys, spec=None, use_numpy=None, intern_limit=10000,
+                 chunk_rows=65536):
+    """Load rows into typed Columns, coercing with a coerce_values spec.
+
+    Like map(coerce_values(spec), map(row_to_dict(keys), rows)) but builds
+    a column per key instead of a dict per row.  Columns coerced with int
+    or float are stored in arrays, at 8 bytes a value.
+
+    Rows are split into columns a chunk at a time, and each column is
+    coerced with a single map() call, so there's no per-row Python loop.
+
+    Uncoerced text columns are de-duplicated, so a low-cardinality column
+    holds one string object per distinct value.  That stops for a column
+    once it has more than intern_limit distinct values.
+
+    use_numpy: Use NumPy arrays for numeric columns.  Defaults to whether
+               NumPy is installed.
+
+    >>> rows = [['a', '1'], ['b', '2'], ['a', '3']]
+    >>> cols = load_columns(rows, ['tag', 'n'], {'n': int}, use_numpy=False)
+    >>> cols['tag'][0] is cols['tag'][2]
+    True
+    >>> list(cols['n'])
+    [1, 2, 3]
+
+    For files larger than memory, use iter_columns.
+    """
+    chunks = iter_columns(rows, keys, spec, use_numpy=False,
+                          intern_limit=intern_limit, chunk_rows=chunk_rows)
+    loaded = next(chunks, None)
+    if loaded is None:
+        loaded = Columns(keys, dict((key, _empty_column(spec, key))
+                                    for key in keys))
+    for chunk in chunks:
+        for key in keys:
+            loaded.columns[key].extend(chunk.columns[key])
+    if _want_numpy(use_numpy):
+        _to_numpy(loaded)
+    return loaded
+
+def iter_columns(rows, keys, spec=None, use_numpy=None, intern_limit=10000,
+                 chunk_rows=65536):
+    """Generate Columns for successive chunks of chunk_rows rows.
+
+    Takes the same arguments as load_columns.  String de-duplication is
+    shared between chunks.
+
+    >>> rows = ([str(i), str(i * 10)] for i in range(5))
+    >>> [list(c['b']) for c in iter_columns(rows, ['a', 'b'], {'b': int},
+    ...                                     use_numpy=False, chunk_rows=2)]
+    [[0, 10], [20, 30], [40]]
+    """
+    spec = spec or {}
+    keys = list(keys)
+    use_numpy = _want_numpy(use_numpy)
+    interned = dict((key, {}) for key in keys if key not in spec)
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_rows))
+        if not chunk:
+            return
+        shortest = min(map(len, chunk))
+        if shortest < len(keys):
+            raise ValueError("rows have %d fields, but %d keys were given"
+                             % (shortest, len(keys)))
+        columns = {}
+        for position, key in enumerate(keys):
+            # Much faster than zip(*chunk), which is slow with many arguments
+            values = list(map(operator.itemgetter(position), chunk))
+            coerce = spec.get(key)
+            if coerce is None:
+                cache = interned.get(key)
+                if cache is None:
+                    columns[key] = list(values)
+                else:
+                    columns[key] = list(map(cache.setdefault, values, values))
+                    if len(cache) > intern_limit:
+                        # Too many distinct values for de-duplication to pay
+                        interned[key] = None
+            elif coerce in _TYPECODES:
+                columns[key] = array.array(_TYPECODES[coerce], map(coerce, values))
+            else:
+                columns[key] = list(map(coerce, values))
+        loaded = Columns(keys, columns)
+        if use_numpy:
+            _to_numpy(loaded)
+        yield loaded
+
+def _want_numpy(use_numpy):
+    if use_numpy is None:
+        return _lazy.has_numpy()
+    if use_numpy and not _lazy.has_numpy():
+        raise ImportError("use_numpy needs numpy installed")
+    return use_numpy
+
+def _empty_column(spec, key):
+    coerce = (spec or {}).get(key)
+    if coerce in _TYPECODES:
+        return array.array(_TYPECODES[coerce])
+    return []
+
+def _to_numpy(loaded):
+    for key, column in loaded.columns.items():
+        if isinstance(column, array.array):
+            loaded.columns[key] = _numpy.frombuffer(column, dtype=column.typecode)
+
+def _python_values(column, block=65536):
+    """Iterate over a column as plain Python values.
+    """
+    if _lazy.is_ndarray(column):
+        return itertools.chain.from_iterable(
+            column[start:start + block].tolist()
+            for start in range(0, len(column), block))
+    return iter(column)
+
+def _adder(function, getter=None, single=False):
+    if getter is None:
+        def add(row):
+            row.append(function(row))
+    elif single:
+        def add(row):
+            row.append(function(getter(row)))
+    else:
+        def add(row):
+            row.append(function(*getter(row)))
+    return add
+
+def _transformer(index, function):
+    def transform(row):
+        row[index] = function(row[index])
+    return transform
+
+def _open(file_or_name, mode, buffer_size, encoding):
+    if hasattr(file_or_name, 'read' if mode == 'r' else 'write'):
+        return file_or_name
+    return open(file_or_name, mode, buffering=buffer_size, encoding=encoding,
+                newline='')
+
+class _Counter(object):
+    def __init__(self):
+        self.rows = 0
+
+    def count(self, function, rows):
+        for row in rows:
+            self.rows += 1
+            yield function(row)
+
 
 if __name__ == "__main__":
     import doctest
@@ -1,22 +1,86 @@
 #! /usr/bin/env python
 
 """Date and time formatting and parsing functions.
+
+Common fixed-width formats (made of %Y, %m, %d, %H, %M, %S and literal
+separators, optionally ending in %z) are compiled into specialised parsers
+that slice the fields out at fixed positions, instead of going through
+datetime.strptime every time.  Anything that doesn't fit falls back to
+datetime.strptime, so the results are the same either way.
+
+strptime_many, strftime_many and convert_format_many work on whole columns
+of values.  They use NumPy datetime64 arrays if NumPy is installed, and
+arrays of integer seconds since the epoch otherwise.  Invalid entries don't
+stop the conversion, they're reported in a mask instead.
 """
 
+import array
 import datetime
-from functional import compose
+import functools
+
+from . import _lazy
+from . import instrument as _instrument
+from .func import compose
+from ._lazy import numpy as _numpy
+
+try:
+    _utc = datetime.timezone.utc
+except AttributeError:
+    # Python 2 has no fixed-offset timezones, so %z isn't compiled
+    _utc = None
 
-def convert_format(from_format, to_format):
+# str.isdigit accepts any Unicode digit, which strptime mostly doesn't, so
+# the fast paths also check for ASCII.  Python 2 str is bytes anyway.
+_HAS_ISASCII = hasattr(str, 'isascii')
+
+# Fields that can be sliced out of a string: directive -> (attribute, width)
+_FIELDS = {
+    'Y': ('year', 4),
+    'm': ('month', 2),
+    'd': ('day', 2),
+    'H': ('hour', 2),
+    'M': ('minute', 2),
+    'S': ('second', 2),
+}
+
+# What strptime uses for fields that aren't in the format
+_DEFAULTS = (('year', '1900'), ('month', '1'), ('day', '1'),
+             ('hour', '0'), ('minute', '0'), ('second', '0'))
+
+@_instrument.profiled
+def convert_format(from_format, to_format, validate=True, cache_size=None):
     """convert_format(from_format, to_format)(timestr) -> str
-    
+
     Convert between two time formats.
 
     >>> convert_format('%d/%m/%Y', '%Y-%m-%d')('21/12/2112')
     '2112-12-21'
+
+    If validate is False and both formats are fixed-width with the same
+    fields, the string is converted by reordering its fields directly,
+    without building a datetime.  The fields are checked to be digits,
+    but not that they make a real date:
+
+    >>> convert_format('%d/%m/%Y', '%Y-%m-%d', validate=False)('21/12/2112')
+    '2112-12-21'
+    >>> convert_format('%d/%m/%Y', '%Y-%m-%d', validate=False)('31/02/2112')
+    '2112-02-31'
+    >>> convert_format('%d/%m/%Y', '%Y-%m-%d', validate=False).__qualname__
+    'convert_format.<locals>.reorder'
+
+    cache_size: Keep the results for this many recent distinct strings,
+                for when the same values come up again and again.
     """
-    return compose(strftime(to_format), strptime(from_format))
+    converter = None
+    if not validate:
+        converter = _compile_reorder(from_format, to_format)
+    if converter is None:
+        converter = compose(_compile_formatter(to_format), strptime(from_format))
+    converter.__qualname__ = 'convert_format.<locals>.%s' % converter.__name__
+    return _cached(converter, cache_size)
 
-def strptime(from_format):
+@_instrument.profiled
+def strptime(from_format, cache_size=None):
     """strptime(from_format)(timestr) -> datetime.datetime
 
     Return datetime object from timestr according to from_format.
@@ -25,9 +89,35 @@ def strptime(from_format):
 
     >>> strptime('%d/%m/%Y')('21/12/2112').date()
     datetime.date(2112, 12, 21)
+    >>> strptime('%Y-%m-%dT%H:%M:%S%z')('2112-12-21T10:30:00+01:00')
+    datetime.datetime(2112, 12, 21, 10, 30, tzinfo=datetime.timezone(datetime.timedelta(seconds=3600)))
+
+    Strings that don't fit the fixed-width fast path are handed to
+    datetime.strptime, so they're parsed (or rejected) just as before:
+
+    >>> strptime('%Y-%m-%d')('2112-1\uff12-21')
+    Traceback (most recent call last):
+        ...
+    ValueError: time data '2112-1２-21' does not match format '%Y-%m-%d'
+
+    >>> strptime('%d/%m/%Y')('1/2/2112').date()
+    datetime.date(2112, 2, 1)
+    >>> strptime('%d/%m/%Y')('2112-12-21')
+    Traceback (most recent call last):
+        ...
+    ValueError: time data '2112-12-21' does not match format '%d/%m/%Y'
+
+    cache_size: Keep the results for this many recent distinct strings.
     """
-    return lambda timestr: datetime.datetime.strptime(timestr, from_format)
+    parser = _compile_parser(from_format)
+    if parser is not None:
+        parser.__qualname__ = 'strptime.<locals>.fast_strptime'
+    else:
+        def parser(timestr):
+            return datetime.datetime.strptime(timestr, from_format)
+    return _cached(parser, cache_size)
 
+@_instrument.profiled
 def strftime(to_format):
     """strftime(to_format)(dt_obj) -> str
 
@@ -38,7 +128,433 @@ def strftime(to_format):
     >>> strftime('%Y-%m-%d')(datetime.date(2112, 12, 21))
     '2112-12-21'
     """
-    return lambda dt_obj: dt_obj.strftime(to_format)
+    def strftime_format(dt_obj):
+        return dt_obj.strftime(to_format)
+    return strftime_format
+
+@_instrument.profiled
+def strptime_many(from_format, use_numpy=None):
+    """strptime_many(from_format)(column) -> (values, invalid)
+
+    Parse a whole column of strings at once.
+
+    values: A NumPy datetime64[s] array, or an array.array of seconds since
+            the epoch if NumPy isn't installed (or use_numpy is False).
+            Times with a UTC offset are converted to UTC.
+    invalid: A mask (NumPy bool array or list of bools), True for entries
+             which couldn't be parsed.  Their values are NaT, or 0.
+
+    With NumPy, fixed-width formats are parsed with vectorised operations
+    on the characters of the whole column, rather than a string at a time.
+
+    >>> values, invalid = strptime_many('%d/%m/%Y', use_numpy=False)(
+    ...     ['21/12/2112', 'rubbish', '01/01/1970', '31/02/2112'])
+    >>> values
+    array('q', [4511721600, 0, 0, 0])
+    >>> invalid
+    [False, True, False, True]
+    """
+    def strptime_many_column(column):
+        if not hasattr(column, '__getitem__'):
+            column = list(column)
+        if _want_numpy(use_numpy):
+            layout = _fixed_layout(from_format)
+            if layout is not None:
+                values, invalid = _parse_fixed_numpy(column, layout)
+                _reparse_rejected(strptime(from_format), column, values, invalid)
+                return values, invalid
+        parse = strptime(from_format)
+        seconds = []
+        invalid = []
+        for timestr in column:
+            try:
+                seconds.append(_epoch_seconds(parse(timestr)))
+                invalid.append(False)
+            except (ValueError, TypeError):
+                seconds.append(0)
+                invalid.append(True)
+        if _want_numpy(use_numpy):
+            values = _numpy.array(seconds, dtype='datetime64[s]')
+            invalid = _numpy.array(invalid, dtype=bool)
+            values[invalid] = _numpy.datetime64('NaT')
+            return values, invalid
+        return array.array('q', seconds), invalid
+    return strptime_many_column
+
+@_instrument.profiled
+def strftime_many(to_format):
+    """strftime_many(to_format)(values, invalid=None) -> list of str
+
+    Format a column of values as returned by strptime_many.  Entries
+    marked in the invalid mask (or NaT) come out as None.
+
+    With NumPy, fixed-width formats are built with vectorised string
+    operations.  Years before 1000 are still formatted by strftime, so the
+    results are the same with or without NumPy:
+
+    >>> strftime_many('%Y-%m-%d')(array.array('q', [4511721600, 0]), [False, True])
+    ['2112-12-21', None]
+    >>> from . import _lazy
+    >>> column = ['24/10/0089', '21/12/2112']
+    >>> both = [convert_format_many('%d/%m/%Y', '%Y-%m-%d', use_numpy=use)(column)
+    ...         for use in (False, _lazy.has_numpy())]
+    >>> both[0] == both[1]
+    True
+    """
+    formatter = _compile_formatter(to_format)
+    def strftime_many_column(values, invalid=None):
+        if _lazy.is_ndarray(values):
+            values = values.astype('datetime64[s]')
+            if invalid is None:
+                invalid = _numpy.isnat(values)
+            else:
+                invalid = _numpy.asarray(invalid, dtype=bool) | _numpy.isnat(values)
+            tokens = _tokenise(to_format)
+            if tokens and ('offset',) not in tokens:
+                return _format_fixed_numpy(values, invalid, tokens, formatter)
+            values = values.astype('int64').tolist()
+            invalid = invalid.tolist()
+        if invalid is None:
+            invalid = [False] * len(values)
+        return [None if bad else formatter(_EPOCH + datetime.timedelta(seconds=value))
+                for (value, bad) in zip(values, invalid)]
+    return strftime_many_column
+
+@_instrument.profiled
+def convert_format_many(from_format, to_format, use_numpy=None):
+    """convert_format_many(from_format, to_format)(column) -> (strings, invalid)
+
+    Convert a whole column of strings between two time formats.
+    Entries which can't be parsed come out as None, and True in invalid.
+
+    >>> convert_format_many('%d/%m/%Y', '%Y-%m-%d', use_numpy=False)(
+    ...     ['21/12/2112', '32/12/2112'])
+    (['2112-12-21', None], [False, True])
+    """
+    parse = strptime_many(from_format, use_numpy)
+    format_values = strftime_many(to_format)
+    def convert_format_many_column(column):
+        values, invalid = parse(column)
+        strings = format_values(values, invalid)
+        if not isinstance(invalid, list):
+            invalid = invalid.tolist()
+        return strings, invalid
+    return convert_format_many_column
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+def _epoch_seconds(dt_obj):
+    if dt_obj.tzinfo is not None:
+        dt_obj = dt_obj.astimezone(_utc).replace(tzinfo=None)
+    delta = dt_obj - _EPOCH
+    return delta.days * 86400 + delta.seconds
+
+def _want_numpy(use_numpy):
+    if use_numpy is None:
+        return _lazy.has_numpy()
+    if use_numpy and not _lazy.has_numpy():
+        raise ImportError("use_numpy needs numpy installed")
+    return use_numpy
+
+def _fixed_layout(time_format):
+    tokens = _tokenise(time_format)
+    if not tokens or ('offset',) in tokens:
+        return None
+    return _layout(tokens) or None
+
+def _parse_fixed_numpy(column, layout):
+    """Parse a column of fixed-width strings with vectorised operations.
+
+    Each string becomes a row of Unicode code points, so fields can be
+    picked out by column and checked all at once.
+    """
+    length, fields, literals = layout
+    count = len(column)
+    # One spare character, so strings that are too long can be spotted
+    strings = _numpy.array(
+        [value if isinstance(value, str) else '' for value in column],
+        dtype='U%d' % (length + 1))
+    codes = strings.view(_numpy.uint32).reshape(count, length + 1)
+    valid = codes[:, length] == 0
+    if length:
+        valid &= codes[:, length - 1] != 0
+    for start, literal in literals:
+        for offset, char in enumerate(literal):
+            valid &= codes[:, start + offset] == ord(char)
+    parts = {}
+    for name, (start, end) in fields.items():
+        digits = codes[:, start:end].astype(_numpy.int64) - ord('0')
+        valid &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+        parts[name] = (digits * 10 ** _numpy.arange(end - start - 1, -1, -1)).sum(axis=1)
+    get = lambda name, default: parts.get(name, _numpy.full(count, default, dtype=_numpy.int64))
+    years = get('year', 1900)
+    months = get('month', 1)
+    days = get('day', 1)
+    hours = get('hour', 0)
+    minutes = get('minute', 0)
+    seconds = get('second', 0)
+    valid &= ((years >= 1) & (months >= 1) & (months <= 12) & (days >= 1)
+              & (hours <= 23) & (minutes <= 59) & (seconds <= 59))
+    # Keep the arithmetic below in range for the invalid entries
+    years = _numpy.where(valid, years, 1970)
+    months = _numpy.where(valid, months, 1)
+    days = _numpy.where(valid, days, 1)
+    month_starts = ((years - 1970).astype('datetime64[Y]').astype('datetime64[M]')
+                    + (months - 1).astype('timedelta64[M]'))
+    dates = month_starts.astype('datetime64[D]') + (days - 1).astype('timedelta64[D]')
+    # Catch days past the end of the month, like 31st February
+    valid &= dates.astype('datetime64[M]') == month_starts
+    values = (dates.astype('datetime64[s]')
+              + (hours * 3600 + minutes * 60 + seconds).astype('timedelta64[s]'))
+    invalid = ~valid
+    values[invalid] = _numpy.datetime64('NaT')
+    return values, invalid
+
+def _reparse_rejected(parse, column, values, invalid):
+    # strptime is more lenient than the fixed layout (it allows short
+    # fields, for example), so give anything rejected a second chance
+    for index in _numpy.flatnonzero(invalid).tolist():
+        try:
+            seconds = _epoch_seconds(parse(column[index]))
+        except (ValueError, TypeError):
+            continue
+        values[index] = _numpy.datetime64(seconds, 's')
+        invalid[index] = False
+
+def _format_fixed_numpy(values, invalid, tokens, formatter):
+    """Format datetime64[s] values by writing the character codes of the
+    whole column into one array, and viewing that as strings.
+
+    Years before 1000 are passed to formatter one at a time.
+    """
+    safe = _numpy.where(invalid, _numpy.datetime64(0, 's'), values)
+    years = safe.astype('datetime64[Y]')
+    months = safe.astype('datetime64[M]')
+    days = safe.astype('datetime64[D]')
+    in_day = (safe - days).astype(_numpy.int64)
+    parts = {
+        'year': years.astype(_numpy.int64) + 1970,
+        'month': (months - years.astype('datetime64[M]')).astype(_numpy.int64) + 1,
+        'day': (days - months.astype('datetime64[D]')).astype(_numpy.int64) + 1,
+        'hour': in_day // 3600,
+        'minute': in_day // 60 % 60,
+        'second': in_day % 60,
+    }
+    # Same range as datetime
+    invalid = invalid | (parts['year'] < 1) | (parts['year'] > 9999)
+    length = sum(token[2] if token[0] == 'field' else len(token[1])
+                 for token in tokens)
+    codes = _numpy.zeros((len(values), length), dtype=_numpy.uint32)
+    position = 0
+    for token in tokens:
+        if token[0] == 'field':
+            value = parts[token[1]]
+            width = token[2]
+            for place in range(width):
+                codes[:, position + place] = (
+                    value // 10 ** (width - 1 - place) % 10 + ord('0'))
+            position += width
+        else:
+            for char in token[1]:
+                codes[:, position] = ord(char)
+                position += 1
+    result = codes.view('U%d' % length).ravel().astype(object)
+    result[invalid] = None
+    # Platforms differ in whether strftime pads these, so do as it does
+    early = _numpy.flatnonzero(~invalid & (parts['year'] < 1000))
+    seconds = safe.astype(_numpy.int64)
+    for index in early.tolist():
+        result[index] = formatter(
+            _EPOCH + datetime.timedelta(seconds=int(seconds[index])))
+    return result.tolist()
+
+def _cached(function, cache_size):
+    if cache_size is None or not hasattr(functools, 'lru_cache'):
+        return function
+    return functools.lru_cache(maxsize=cache_size)(function)
+
+def _tokenise(time_format):
+    """Split a format into ('field', attribute, width), ('literal', text)
+    and ('offset',) tokens, or return None if it has other directives.
+
+    >>> _tokenise('%d/%m/%Y')
+    [('field', 'day', 2), ('literal', '/'), ('field', 'month', 2), ('literal', '/'), ('field', 'year', 4)]
+    >>> _tokenise('%b %d') is None
+    True
+    """
+    tokens = []
+    position = 0
+    while position < len(time_format):
+        char = time_format[position]
+        if char != '%':
+            tokens.append(('literal', char))
+            position += 1
+            continue
+        directive = time_format[position + 1:position + 2]
+        if directive in _FIELDS:
+            tokens.append(('field',) + _FIELDS[directive])
+        elif directive == '%':
+            tokens.append(('literal', '%'))
+        elif directive == 'z' and _utc is not None:
+            tokens.append(('offset',))
+        else:
+            return None
+        position += 2
+    # Merge adjacent literals, and only allow an offset at the end
+    merged = []
+    for token in tokens:
+        if merged and token[0] == 'literal' and merged[-1][0] == 'literal':
+            merged[-1] = ('literal', merged[-1][1] + token[1])
+        else:
+            merged.append(token)
+    if ('offset',) in merged[:-1]:
+        return None
+    return merged
+
+def _layout(tokens):
+    """Return (length, {attribute: (start, end)}, [(start, literal)]) for
+    the fixed-width part of a tokenised format.
+    """
+    position = 0
+    fields = {}
+    literals = []
+    for token in tokens:
+        if token[0] == 'field':
+            if token[1] in fields:
+                return None
+            fields[token[1]] = (position, position + token[2])
+            position += token[2]
+        elif token[0] == 'literal':
+            literals.append((position, token[1]))
+            position += len(token[1])
+    return position, fields, literals
+
+def _shape_check(length, fields, literals, has_offset):
+    """Source for a test that a string s fits a fixed-width layout.
+    """
+    checks = ['len(s) %s %d' % ('>' if has_offset else '==', length)]
+    for start, literal in literals:
+        checks.append('s[%d:%d] == %r' % (start, start + len(literal), literal))
+    if fields:
+        digits = ' + '.join('s[%d:%d]' % span for span in sorted(fields.values()))
+        checks.append('(%s).isdigit()' % digits)
+        if _HAS_ISASCII:
+            if all(literal.isascii() for start, literal in literals):
+                # Checking the whole string is O(1), so cheaper than the fields
+                checks.insert(1, 's.isascii()')
+            else:
+                checks.append('(%s).isascii()' % digits)
+    return ' and '.join(checks)
+
+def _compile_parser(from_format):
+    tokens = _tokenise(from_format)
+    layout = tokens and _layout(tokens)
+    if not layout:
+        return None
+    length, fields, literals = layout
+    has_offset = tokens[-1] == ('offset',)
+    arguments = ', '.join(
+        'int(s[%d:%d])' % fields[name] if name in fields else default
+        for (name, default) in _DEFAULTS)
+    if has_offset:
+        body = (
+            '            tz = offset(s[%d:])\n'
+            '            if tz is not None:\n'
+            '                return datetime(%s, tzinfo=tz)\n'
+        ) % (length, arguments)
+    else:
+        body = '            return datetime(%s)\n' % arguments
+    code = (
+        'def _make(datetime, slow, offset):\n'
+        '    def fast_strptime(s):\n'
+        '        if %s:\n'
+        '%s'
+        '        return slow(s)\n'
+        '    return fast_strptime\n'
+    ) % (_shape_check(length, fields, literals, has_offset), body)
+    slow = lambda timestr: datetime.datetime.strptime(timestr, from_format)
+    return _exec_factory(code)(datetime.datetime, slow, _offset)
+
+def _compile_formatter(to_format):
+    """Compile to_format into a function formatting a datetime.
+
+    Years before 1000 are left to strftime, as platforms differ in whether
+    they pad them.
+    """
+    tokens = _tokenise(to_format)
+    if not tokens or ('offset',) in tokens:
+        return strftime(to_format)
+    pieces = []
+    attributes = []
+    for token in tokens:
+        if token[0] == 'field':
+            pieces.append('%%0%dd' % token[2])
+            attributes.append('d.%s' % token[1])
+        else:
+            pieces.append(token[1].replace('%', '%%'))
+    code = (
+        'def _make(slow):\n'
+        '    def fast_strftime(d):\n'
+        '        if d.year >= 1000:\n'
+        '            return %r %% (%s,)\n'
+        '        return slow(d)\n'
+        '    return fast_strftime\n'
+    ) % (''.join(pieces), ', '.join(attributes))
+    return _exec_factory(code)(strftime(to_format))
+
+def _compile_reorder(from_format, to_format):
+    """Compile a direct string to string conversion, or return None if the
+    formats can't be converted just by moving fields around.
+    """
+    from_tokens = _tokenise(from_format)
+    to_tokens = _tokenise(to_format)
+    if not from_tokens or not to_tokens:
+        return None
+    if ('offset',) in from_tokens or ('offset',) in to_tokens:
+        return None
+    layout = _layout(from_tokens)
+    if not layout:
+        return None
+    length, fields, literals = layout
+    pieces = []
+    for token in to_tokens:
+        if token[0] == 'literal':
+            pieces.append(repr(token[1]))
+        elif token[1] in fields:
+            pieces.append('s[%d:%d]' % fields[token[1]])
+        else:
+            return None
+    code = (
+        'def _make(slow):\n'
+        '    def reorder(s):\n'
+        '        if %s:\n'
+        '            return %s\n'
+        '        return slow(s)\n'
+        '    return reorder\n'
+    ) % (_shape_check(length, fields, literals, False), ' + '.join(pieces))
+    return _exec_factory(code)(convert_format(from_format, to_format))
+
+def _exec_factory(code):
+    namespace = {}
+    exec(code, namespace)
+    return namespace['_make']
+
+def _offset(text):
+    """Parse a %z offset ('Z', '+HHMM' or '+HH:MM'), or return None.
+    """
+    if text == 'Z':
+        return _utc
+    if len(text) == 6 and text[3] == ':':
+        text = text[:3] + text[4:]
+    if (len(text) != 5 or text[0] not in '+-'
+            or not all('0' <= c <= '9' for c in text[1:]) or text[3] > '5'):
+        # Minutes over 59 aren't allowed, as in strptime
+        return None
+    minutes = int(text[1:3]) * 60 + int(text[3:5])
+    if minutes == 0:
+        return _utc
+    return datetime.timezone(datetime.timedelta(
+        minutes=-minutes if text[0] == '-' else minutes))
 
 if __name__ == "__main__":
     import doctest
@@ -3,6 +3,17 @@
 """Perform logic on predicate functions.
 """
 
+import itertools as _itertools
+import os as _os
+import threading as _threading
+
+from . import _lazy
+from . import instrument as _instrument
+from ._lazy import futures as _futures
+from ._lazy import numpy as _numpy
+from .op import Expr as _Expr
+
+@_instrument.profiled
 def fnot(predicate):
     """Not the return value of predicate at call time.
 
@@ -13,7 +24,9 @@ def fnot(predicate):
     >>> is_even(2)
     True
     """
-    return lambda val: not predicate(val)
+    def fnot_predicate(val):
+        return not predicate(val)
+    return fnot_predicate
 
 def f_all(predicate, iterable):
     """Return whether predicate(i) is True for all i in iterable
@@ -28,6 +41,444 @@ def f_all(predicate, iterable):
     """
     return all(predicate(i) for i in iterable)
 
+def f_any(predicate, iterable):
+    """Return whether predicate(i) is True for any i in iterable
+
+    >>> is_odd = lambda num: (num % 2 == 1)
+    >>> f_any(is_odd, [])
+    False
+    >>> f_any(is_odd, [2, 4, 5])
+    True
+    """
+    return any(predicate(i) for i in iterable)
+
+def f_count(predicate, iterable):
+    """Return how many i in iterable predicate(i) is True for
+
+    >>> is_odd = lambda num: (num % 2 == 1)
+    >>> f_count(is_odd, [1, 2, 3, 5])
+    3
+    """
+    return sum(1 for i in iterable if predicate(i))
+
+def f_all_parallel(predicate, threshold=10000, chunk_size=None,
+                   max_workers=None, use_processes=False, executor=None,
+                   vectorised=None):
+    """f_all_parallel(predicate, ...)(iterable) - Parallel f_all.
+
+    Like f_all, but checks chunks of iterable in a thread or process pool.
+    As soon as a chunk fails, the chunks not yet started are cancelled (and,
+    with threads, the running ones stop early too), so the answer can come
+    back long before the whole iterable has been checked.
+
+    Worth it when the predicate is expensive.  Iterables shorter than
+    threshold are checked serially, as the pool overhead would outweigh
+    any gain.  Iterables are read lazily, a few chunks per worker at a time.
+
+    threshold: Minimum number of items before going parallel.
+    chunk_size: Items per chunk.  Defaults to a split into 8 chunks per
+                worker for sequences, and 4096 otherwise.
+    max_workers: Passed to the executor if we create one, and used to size
+                 chunks.  Defaults to the number of CPUs.
+    use_processes: Use a ProcessPoolExecutor instead of a ThreadPoolExecutor.
+                   The predicate must then be picklable (so no lambdas).
+    executor: An existing concurrent.futures executor to use instead.
+    vectorised: Whether to call predicate once on the whole of a NumPy array,
+                and reduce the resulting array of bools.  Defaults to True
+                if predicate is a funbox.op expression.
+
+    >>> is_odd = lambda num: (num % 2 == 1)
+    >>> f_all_parallel(is_odd, threshold=0, chunk_size=3)([1, 3, 5, 7, 9])
+    True
+    >>> f_all_parallel(is_odd, threshold=0, chunk_size=3)(iter([1, 3, 4, 7]))
+    False
+    >>> f_all_parallel(is_odd)([])
+    True
+    """
+    return _parallel('all', predicate, threshold, chunk_size, max_workers,
+                     use_processes, executor, vectorised)
+
+def f_any_parallel(predicate, threshold=10000, chunk_size=None,
+                   max_workers=None, use_processes=False, executor=None,
+                   vectorised=None):
+    """f_any_parallel(predicate, ...)(iterable) - Parallel f_any.
+
+    Stops as soon as a chunk passes.  See f_all_parallel for the options.
+
+    >>> from .op import gt
+    >>> f_any_parallel(gt(100), threshold=0, chunk_size=10)(range(1000))
+    True
+    >>> f_any_parallel(gt(100), threshold=0, chunk_size=10)(range(100))
+    False
+    """
+    return _parallel('any', predicate, threshold, chunk_size, max_workers,
+                     use_processes, executor, vectorised)
+
+def f_count_parallel(predicate, threshold=10000, chunk_size=None,
+                     max_workers=None, use_processes=False, executor=None,
+                     vectorised=None):
+    """f_count_parallel(predicate, ...)(iterable) - Parallel f_count.
+
+    There's no stopping early here: every chunk has to be counted.
+    See f_all_parallel for the options.
+
+    >>> from .op import gt
+    >>> f_count_parallel(gt(100), threshold=0, chunk_size=64)(range(1000))
+    899
+    """
+    return _parallel('count', predicate, threshold, chunk_size, max_workers,
+                     use_processes, executor, vectorised)
+
+# Result of a chunk which settles the answer straight away
+_DECISIVE = {'all': False, 'any': True}
+
+def _parallel(kind, predicate, threshold, chunk_size, max_workers,
+              use_processes, executor, vectorised):
+    def reduce_parallel(iterable):
+        if _lazy.is_ndarray(iterable):
+            use_vector = (isinstance(predicate, _Expr) if vectorised is None
+                          else vectorised)
+            if use_vector:
+                return _reduce_array(kind, predicate, iterable)
+        items = iter(iterable)
+        head = list(_itertools.islice(items, max(threshold, 1)))
+        if len(head) < max(threshold, 1):
+            return _reduce_chunk(kind, predicate, head)
+        if executor is not None:
+            return _reduce_in(executor, iterable, head, items)
+        if not _lazy.available(_futures):
+            raise RuntimeError("parallel reductions need concurrent.futures")
+        pool_class = (_futures.ProcessPoolExecutor if use_processes
+                      else _futures.ThreadPoolExecutor)
+        pool = pool_class(max_workers=max_workers)
+        try:
+            return _reduce_in(pool, iterable, head, items)
+        finally:
+            pool.shutdown()
+
+    def _reduce_in(pool, iterable, head, items):
+        workers = max_workers or _os.cpu_count() or 4
+        size = chunk_size
+        if not size:
+            if hasattr(iterable, '__len__'):
+                size = max(-(-len(iterable) // (workers * 8)), 1)
+            else:
+                size = 4096
+        is_threads = not isinstance(pool, _futures.ProcessPoolExecutor)
+        stop = _threading.Event() if is_threads else None
+        items = _itertools.chain(head, items)
+        decisive = _DECISIVE.get(kind)
+        total = 0
+        pending = set()
+        try:
+            while True:
+                while len(pending) < workers * 2:
+                    chunk = list(_itertools.islice(items, size))
+                    if not chunk:
+                        break
+                    if is_threads:
+                        pending.add(pool.submit(_reduce_chunk, kind, predicate,
+                                                chunk, stop))
+                    else:
+                        pending.add(pool.submit(_reduce_chunk, kind, predicate,
+                                                chunk))
+                if not pending:
+                    break
+                done, pending = _futures.wait(
+                    pending, return_when=_futures.FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if result is decisive:
+                        return decisive
+                    total += result
+        finally:
+            if stop is not None:
+                stop.set()
+            for future in pending:
+                future.cancel()
+        if kind == 'count':
+            return total
+        return not decisive
+
+    return reduce_parallel
+
+def _reduce_chunk(kind, predicate, chunk, stop=None):
+    """Reduce one chunk.  Checks stop every so often, if given, and gives up
+    with a None result once it's set.
+    """
+    if stop is None:
+        if kind == 'all':
+            return all(map(predicate, chunk))
+        if kind == 'any':
+            return any(map(predicate, chunk))
+        return sum(1 for item in chunk if predicate(item))
+    total = 0
+    for start in range(0, len(chunk), 256):
+        if stop.is_set():
+            return None
+        result = _reduce_chunk(kind, predicate, chunk[start:start + 256])
+        if result is _DECISIVE.get(kind):
+            return result
+        total += result
+    if kind == 'count':
+        return total
+    return not _DECISIVE[kind]
+
+def _reduce_array(kind, predicate, values):
+    if isinstance(predicate, _Expr):
+        predicate = predicate.vectorise()
+    mask = _numpy.asarray(predicate(values), dtype=bool)
+    if kind == 'all':
+        return bool(mask.all())
+    if kind == 'any':
+        return bool(mask.any())
+    return int(_numpy.count_nonzero(mask))
+
+def f_and(*predicates, **options):
+    """Return a predicate which is True if all of predicates are, like and.
+
+    The predicates are run in order, stopping at the first one which fails.
+
+    >>> is_odd = lambda num: num % 2 == 1
+    >>> is_small = lambda num: num < 10
+    >>> small_odd = f_and(is_odd, is_small)
+    >>> [num for num in range(15) if small_odd(num)]
+    [1, 3, 5, 7, 9]
+    >>> small_odd.__qualname__
+    'f_and.<locals>.and_predicates'
+    >>> f_and()(None)
+    True
+
+    adaptive: If True, measure the cost of each predicate and how often it
+              fails, and reorder them so cheap predicates which fail often
+              run first.  Returns an AdaptivePredicate.  The predicates
+              should be free of side effects, because they may be run in any
+              order, and all of them are run while sampling.
+    sample_every: Calls between sampling windows, when adaptive.
+    sample_size: Calls in each sampling window, when adaptive.
+
+    >>> checks = f_and(is_small, is_odd, adaptive=True, sample_size=20)
+    >>> [num for num in range(15) if checks(num)]
+    [1, 3, 5, 7, 9]
+    """
+    return _combine('and', predicates, options)
+
+def f_or(*predicates, **options):
+    """Return a predicate which is True if any of predicates are, like or.
+
+    The predicates are run in order, stopping at the first one which passes.
+    Takes the same options as f_and; when adaptive, predicates which are
+    cheap and pass often are moved to the front.
+
+    >>> is_odd = lambda num: num % 2 == 1
+    >>> is_small = lambda num: num < 3
+    >>> small_or_odd = f_or(is_odd, is_small)
+    >>> [num for num in range(8) if small_or_odd(num)]
+    [0, 1, 2, 3, 5, 7]
+    >>> f_or()(None)
+    False
+    """
+    return _combine('or', predicates, options)
+
+
+class AdaptivePredicate(object):
+    """An and/or combination of predicates which reorders itself.
+
+    Created by f_and and f_or with adaptive=True.
+
+    The first sample_size calls, and sample_size calls after every
+    sample_every calls after that, are a sampling window.  During a window
+    every predicate is run and timed, whether or not the result is already
+    known.  At the end of the window the predicates are sorted by their
+    average cost divided by how often they decided the result (failed, for
+    and; passed, for or), based on that window alone so the order can keep
+    up with changes in the data.
+
+    order: The predicates in the order they're currently run.
+    windows: Number of sampling windows completed.
+    fixed: True once the order has been fixed as written, see below.
+
+    Outside sampling windows the predicates are run by a generated function
+    with no bookkeeping, so the only overhead is a counter.
+
+    The predicates must not depend on each other, as they can be run in
+    any order, and all of them are run during sampling.  A predicate which
+    only works after an earlier one has passed, such as a None check
+    guarding a method call, doesn't fit.  If a predicate raises an
+    exception, while sampling or after being reordered, that's taken to
+    mean it depends on an earlier one: the value is checked again in the
+    order written, and that order is kept from then on.
+
+    >>> check = f_and(lambda s: s is not None, lambda s: s.startswith('a'),
+    ...               adaptive=True)
+    >>> [check(s) for s in ['apple', None, 'banana']]
+    [True, False, False]
+    >>> check.fixed
+    True
+
+    The same goes for a value which only turns up after the predicates
+    have been reordered:
+
+    >>> check = f_and(lambda s: s is not None, lambda s: s.startswith('a'),
+    ...               adaptive=True, sample_size=10)
+    >>> [check(s) for s in ['apple', 'banana'] * 5]
+    [True, False, True, False, True, False, True, False, True, False]
+    >>> check(None), check.fixed
+    (False, True)
+
+    >>> import time
+    >>> def slow_rejects_few(num):
+    ...     time.sleep(0.0002)
+    ...     return num != 3
+    >>> def fast_rejects_most(num):
+    ...     return num % 10 == 0
+    >>> check = f_and(slow_rejects_few, fast_rejects_most, adaptive=True,
+    ...               sample_every=50, sample_size=10)
+    >>> [num for num in range(100) if check(num)]
+    [0, 10, 20, 30, 40, 50, 60, 70, 80, 90]
+    >>> [predicate.__name__ for predicate in check.order]
+    ['fast_rejects_most', 'slow_rejects_few']
+    >>> check.windows
+    2
+    >>> stats = check.stats()
+    >>> stats[0][0].__name__, stats[0][1].calls
+    ('slow_rejects_few', 20)
+    >>> stats[1][0].__name__, stats[1][1].calls, stats[1][1].short_circuits
+    ('fast_rejects_most', 20, 18)
+    """
+    def __init__(self, logic, predicates, sample_every=10000, sample_size=100):
+        if sample_every < 1 or sample_size < 1:
+            raise ValueError("sample_every and sample_size must be positive")
+        self.logic = logic
+        self.predicates = list(predicates)
+        self.order = list(self.predicates)
+        self.windows = 0
+        self.fixed = False
+        self.sample_every = sample_every
+        self.sample_size = sample_size
+        self._totals = [_instrument.StageStats() for _ in self.predicates]
+        self._start_window()
+
+    def __call__(self, val):
+        try:
+            result = self._check(val)
+        except Exception:
+            if self.fixed:
+                raise
+            # A reordered predicate ran before the one guarding it
+            self._fix_order()
+            result = self._check(val)
+        self._remaining -= 1
+        if not self._remaining:
+            if self._sampling:
+                self._end_window()
+            else:
+                self._start_window()
+        return result
+
+    def stats(self):
+        """Return a list of (predicate, StageStats) over all the sampling
+        windows so far, in the original order.
+
+        calls counts the times a predicate was run, and short_circuits the
+        times it decided the result.
+        """
+        return list(zip(self.predicates, self._totals))
+
+    def resample(self):
+        """Start a new sampling window with the next call, unless the order
+        has been fixed.
+        """
+        self._start_window()
+
+    def __repr__(self):
+        return 'AdaptivePredicate(%r, %r)' % (self.logic, self.order)
+
+    def _start_window(self):
+        if self.fixed:
+            self._remaining = self.sample_every
+            return
+        self._sampling = True
+        self._remaining = self.sample_size
+        self._window = [_instrument.StageStats() for _ in self.predicates]
+        self._check = self._measure
+
+    def _end_window(self):
+        self.windows += 1
+        for total, stats in zip(self._totals, self._window):
+            total.merge(stats)
+        ranked = sorted(range(len(self.predicates)),
+                        key=lambda index: _rank(self._window[index]))
+        self.order = [self.predicates[index] for index in ranked]
+        self._sampling = False
+        self._remaining = self.sample_every
+        self._check = _compile_logic(self.logic, self.order)
+
+    def _measure(self, val):
+        decides = self.logic == 'or'
+        decided = False
+        timer = _instrument.timer
+        for stats, predicate in zip(self._window, self.predicates):
+            started = timer()
+            try:
+                passed = bool(predicate(val))
+            except Exception:
+                self._fix_order()
+                return self._check(val)
+            stats.elapsed += timer() - started
+            stats.calls += 1
+            if passed == decides:
+                stats.short_circuits += 1
+                decided = True
+        return decided == decides
+
+    def _fix_order(self):
+        self.fixed = True
+        self.order = list(self.predicates)
+        self._sampling = False
+        self._remaining = self.sample_every
+        self._check = _compile_logic(self.logic, self.order)
+
+
+def _rank(stats):
+    # Expected cost of running a predicate per time it settles the result
+    if not stats.short_circuits:
+        return float('inf')
+    return stats.elapsed / stats.short_circuits
+
+def _combine(logic, predicates, options):
+    adaptive = options.pop('adaptive', False)
+    if not adaptive:
+        if options:
+            raise TypeError("unexpected options: %s" % ', '.join(sorted(options)))
+        return _compile_logic(logic, predicates)
+    return AdaptivePredicate(logic, predicates, **options)
+
+_LOGIC_FACTORIES = {}
+
+def _compile_logic(logic, predicates):
+    """Generate a function which applies predicates with and/or inline,
+    rather than looping over them on every call.
+    """
+    key = (logic, len(predicates))
+    factory = _LOGIC_FACTORIES.get(key)
+    if factory is None:
+        names = ['_p%d' % index for index in range(len(predicates))]
+        if names:
+            body = (' %s ' % logic).join('bool(%s(val))' % name for name in names)
+        else:
+            body = repr(logic == 'and')
+        code = (
+            'def f_%s(%s):\n'
+            '    def %s_predicates(val):\n'
+            '        return %s\n'
+            '    return %s_predicates\n'
+        ) % (logic, ', '.join(names), logic, body, logic)
+        namespace = {}
+        exec(code, namespace)
+        factory = _LOGIC_FACTORIES[key] = namespace['f_' + logic]
+    return factory(*predicates)
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
@@ -1,11 +1,73 @@
 #! /usr/bin/env python
 
 """Functions for fiddling around with functions.
+
+curry, flip and compose generate their code for each arity, so calling the
+functions they return involves no *args/**kwargs packing, just the calls
+themselves.
 """
 
+import functools as _functools
+
+from . import instrument as _instrument
+
+
+def curry(function=None, arity=None):
+    """Curry a function, so it takes its arguments one call at a time.
+
+    curry(f)(a)(b)(c) == f(a, b, c)
+
+    arity: Number of arguments to curry.  Defaults to the number of
+           positional arguments without defaults (not counting self, for
+           bound methods), which needs a Python function or method; give
+           it explicitly for builtins.  Keyword-only arguments aren't
+           curried, so they need defaults.
+
+    Each level takes exactly one argument.  Can be used as a decorator,
+    with or without an arity:
+
+    >>> @curry
+    ... def between(low, high, num):
+    ...     return low <= num <= high
+    >>> list(filter(between(2)(4), range(10)))
+    [2, 3, 4]
+    >>> between.__name__
+    'between'
+    >>> divide = curry(divmod, arity=2)
+    >>> divide(7)(2)
+    (3, 1)
+    >>> @curry(arity=1)
+    ... def greet(name, greeting='Hello'):
+    ...     return '%s, %s' % (greeting, name)
+    >>> greet('world')
+    'Hello, world'
+    >>> class Scale(object):
+    ...     def apply(self, factor, num):
+    ...         return factor * num
+    >>> curry(Scale().apply)(5)(3)
+    15
+    """
+    if function is None:
+        return lambda function: curry(function, arity)
+    if arity is None:
+        arity = _arity(function)
+    if arity <= 1:
+        return function
+    curried = _factory(_CURRY_FACTORIES, arity, _curry_source, 'curry')(function)
+    try:
+        _functools.update_wrapper(curried, function)
+    except AttributeError:
+        # Some callables have no __name__ etc.
+        pass
+    return curried
+
 def flip(func):
     """Flip the order of arguments of a curried function.
 
+    flip(f)(x)(y) == f(y)(x)
+
+    Each level takes one argument.
+
     >>> from .op import lt, gt
     >>> lt(3)(2) == flip(lt)(2)(3)
     True
@@ -14,11 +76,104 @@ def flip(func):
     >>> lt(3)(2) == flip(gt)(3)(2)
     True
     """
-    def _flipped(*args_x, **kwargs_x):
-        def _flipped_inner(*args_y, **kwargs_y):
-            return func(*args_y, **kwargs_y)(*args_x, **kwargs_x)
-        return _flipped_inner
-    return _flipped
+    return _factory(_FLIP_FACTORIES, 2, _flip_source, 'flip')(func)
+
+@_instrument.profiled
+def compose(*functions):
+    """compose(f, g, h)(x) == f(g(h(x)))
+
+    Compositions of compositions are flattened, so however they're nested
+    the result is a single generated function with one call per stage.
+    The composed function takes one argument.
+
+    For funbox.op expressions, op.compose also merges their code.
+
+    >>> add_one = lambda x: x + 1
+    >>> double = lambda x: x * 2
+    >>> compose(str, add_one, double)(5)
+    '11'
+    >>> compose(compose(str, add_one), compose(double))(5)
+    '11'
+    >>> compose(str, add_one, double).functions == (str, add_one, double)
+    True
+    >>> compose()(5)
+    5
+    >>> compose(str, add_one).__qualname__
+    'compose.<locals>.composed'
+    """
+    flat = []
+    for function in functions:
+        flat.extend(getattr(function, 'functions', None)
+                    if getattr(function, '_is_composition', False)
+                    else (function,))
+    composed = _factory(_COMPOSE_FACTORIES, len(flat), _compose_source,
+                        'compose')(*flat)
+    composed.functions = tuple(flat)
+    composed._is_composition = True
+    return composed
+
+
+_CURRY_FACTORIES = {}
+_FLIP_FACTORIES = {}
+_COMPOSE_FACTORIES = {}
+
+def _factory(cache, arity, source, name):
+    """Return the generated factory for arity, building it the first time.
+
+    The generated factory is given the name of the public function, so the
+    functions it makes have qualified names like 'curry.<locals>.curried_0'.
+    """
+    make = cache.get(arity)
+    if make is None:
+        namespace = {}
+        exec(source(arity, name), namespace)
+        make = cache[arity] = namespace[name]
+    return make
+
+def _curry_source(arity, name, call=None):
+    lines = ['def %s(_f):' % name]
+    for level in range(arity):
+        indent = '    ' * (level + 1)
+        lines.append('%sdef curried_%d(a%d):' % (indent, level, level))
+    if call is None:
+        call = '_f(%s)' % ', '.join('a%d' % level for level in range(arity))
+    lines.append('%s    return %s' % ('    ' * arity, call))
+    for level in reversed(range(arity)):
+        lines.append('%sreturn curried_%d' % ('    ' * (level + 1), level))
+    return '\n'.join(lines) + '\n'
+
+def _flip_source(arity, name):
+    # The curried levels of a curry, calling the function the other way round
+    return _curry_source(arity, name, call='_f(a1)(a0)')
+
+def _compose_source(count, name):
+    names = ['_f%d' % index for index in range(count)]
+    call = 'x'
+    for function_name in reversed(names):
+        call = '%s(%s)' % (function_name, call)
+    return (
+        'def %s(%s):\n'
+        '    def composed(x):\n'
+        '        return %s\n'
+        '    return composed\n'
+    ) % (name, ', '.join(names), call)
+
+def _arity(function):
+    code = getattr(function, '__code__', None)
+    if code is None:
+        raise TypeError("can't tell the arity of %r, give it explicitly"
+                        % (function,))
+    keyword_only = code.co_varnames[
+        code.co_argcount:code.co_argcount + getattr(code, 'co_kwonlyargcount', 0)]
+    defaults = getattr(function, '__kwdefaults__', None) or {}
+    required = [name for name in keyword_only if name not in defaults]
+    if required:
+        raise TypeError("can't curry %r, keyword-only arguments %s have no "
+                        "defaults" % (function, ', '.join(required)))
+    arity = code.co_argcount - len(function.__defaults__ or ())
+    if getattr(function, '__self__', None) is not None:
+        arity -= 1
+    return arity
 
 
 if __name__ == "__main__":
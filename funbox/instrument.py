@@ -0,0 +1,340 @@
+#! /usr/bin/env python
+
+"""Opt-in instrumentation of funbox pipelines.
+
+When it's enabled, combinators such as maybe, odoo_maybe and the
+passthrough functions record per-stage call counts, short-circuit counts
+and cumulative time in a Registry.  The functions returned by curried
+factories such as mappings.lookup are counted and timed too, per factory
+and arguments (see profiled).
+
+Set the FUNBOX_PROFILE environment variable to turn it on for a whole
+program.  The report is written at exit: FUNBOX_PROFILE=1 prints it on
+stderr, and any other value is taken as a file to write it to, as JSON if
+the name ends in .json.
+
+When it's disabled (the default) there's no overhead at all: the
+instrumented modules swap in their traced implementations when it's
+enabled, and swap them back out when it's disabled.  Curried combinators
+decide when they're built, so build your pipelines after enabling.
+
+>>> from .maybe import maybe_c
+>>> from .mappings import lookup
+>>> registry = enable(Registry())
+>>> get_a = maybe_c(lookup('a'), str.upper)
+>>> results = list(map(get_a, [{'a': 'x'}, {}, None]))
+>>> disable()
+>>> results
+['X', None, None]
+>>> stats = registry.stats()
+>>> stats[('maybe', '0:<input>')].short_circuits
+1
+>>> stats[('maybe', '1:lookup.<locals>._lookup')].short_circuits
+1
+>>> stats[('maybe', '2:str.upper')].calls
+1
+
+Each stage is recorded once, whether the pipeline is called a value at a
+time or through apply_many:
+
+>>> registry = enable(Registry())
+>>> maybe_c(str.upper).apply_many(['x', None, 'y'])
+['X', None, 'Y']
+>>> disable()
+>>> sorted(registry.stats())
+[('maybe', '0:<input>'), ('maybe', '1:str.upper')]
+>>> registry.stats()[('maybe', '1:str.upper')].calls
+2
+"""
+
+import atexit
+import functools
+import os
+import sys
+import time
+import types
+
+try:
+    import reprlib as _reprlib
+except ImportError:
+    # Python 2
+    import repr as _reprlib
+
+try:
+    timer = time.perf_counter
+except AttributeError:
+    # Python 2
+    timer = time.time
+
+
+class StageStats(object):
+    """Statistics for one stage of a pipeline.
+
+    calls: Number of times the stage was run.
+    short_circuits: Number of times the stage cut the pipeline short.
+    elapsed: Cumulative time spent in the stage, in seconds.
+    """
+    __slots__ = ('calls', 'short_circuits', 'elapsed')
+
+    def __init__(self, calls=0, short_circuits=0, elapsed=0.0):
+        self.calls = calls
+        self.short_circuits = short_circuits
+        self.elapsed = elapsed
+
+    def merge(self, other):
+        """Add the figures from another StageStats into this one.
+        """
+        self.calls += other.calls
+        self.short_circuits += other.short_circuits
+        self.elapsed += other.elapsed
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'short_circuits': self.short_circuits,
+            'elapsed': self.elapsed,
+        }
+
+    def __repr__(self):
+        return 'StageStats(calls=%r, short_circuits=%r, elapsed=%r)' % (
+            self.calls, self.short_circuits, self.elapsed)
+
+
+class Registry(object):
+    """Aggregates StageStats by (combinator, stage) key.
+
+    Registries from different threads or processes can be combined with
+    merge().
+
+    >>> a = Registry()
+    >>> a.record(('maybe', '1:f'), 0.5)
+    >>> b = Registry()
+    >>> b.record(('maybe', '1:f'), 0.25, short_circuit=True)
+    >>> a.merge(b).stats()
+    {('maybe', '1:f'): StageStats(calls=2, short_circuits=1, elapsed=0.75)}
+    """
+    def __init__(self):
+        self._stats = {}
+
+    def stage(self, key):
+        """Return the StageStats for key, creating it if necessary.
+        """
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = StageStats()
+        return stats
+
+    def record(self, key, elapsed, short_circuit=False):
+        stats = self.stage(key)
+        stats.calls += 1
+        stats.elapsed += elapsed
+        if short_circuit:
+            stats.short_circuits += 1
+
+    def merge(self, other):
+        """Add all the figures from another Registry into this one.
+        """
+        for key, stats in other._stats.items():
+            self.stage(key).merge(stats)
+        return self
+
+    def stats(self):
+        """Return a dict of {key: StageStats}.
+        """
+        return dict(self._stats)
+
+    def reset(self):
+        self._stats.clear()
+
+    def report(self, sort_by='elapsed'):
+        """Return a text table of the stages, biggest sort_by first.
+        """
+        lines = ['%-50s %10s %10s %12s' % ('stage', 'calls', 'shorted', 'seconds')]
+        for (combinator, stage), stats in self._sorted(sort_by):
+            lines.append('%-50s %10d %10d %12.6f' % (
+                '%s %s' % (combinator, stage),
+                stats.calls, stats.short_circuits, stats.elapsed))
+        return '\n'.join(lines)
+
+    def as_json(self, sort_by='elapsed'):
+        """Return the stages as a JSON list, biggest sort_by first.
+
+        >>> registry = Registry()
+        >>> registry.record(('mappings.lookup', "('a')"), 0.5)
+        >>> print(registry.as_json())
+        [{"calls": 1, "combinator": "mappings.lookup", "elapsed": 0.5, "short_circuits": 0, "stage": "('a')"}]
+        """
+        import json
+        rows = []
+        for (combinator, stage), stats in self._sorted(sort_by):
+            row = stats.as_dict()
+            row['combinator'] = combinator
+            row['stage'] = stage
+            rows.append(row)
+        return json.dumps(rows, sort_keys=True)
+
+    def _sorted(self, sort_by):
+        return sorted(self._stats.items(),
+                      key=lambda item: getattr(item[1], sort_by),
+                      reverse=True)
+
+
+registry = Registry()
+_enabled = False
+_callbacks = []
+
+
+def enable(new_registry=None):
+    """Turn instrumentation on, optionally with a fresh registry.
+
+    Returns the registry in use.
+    """
+    global _enabled, registry
+    if new_registry is not None:
+        registry = new_registry
+    _enabled = True
+    for callback in _callbacks:
+        callback(True)
+    return registry
+
+
+def disable():
+    """Turn instrumentation off.  Recorded figures are kept.
+    """
+    global _enabled
+    _enabled = False
+    for callback in _callbacks:
+        callback(False)
+
+
+def is_enabled():
+    return _enabled
+
+
+def current_registry():
+    return registry
+
+
+def on_toggle(callback):
+    """Register callback(enabled) to be called when instrumentation is
+    turned on or off.  It's called straight away with the current state.
+    """
+    _callbacks.append(callback)
+    callback(_enabled)
+
+
+def stage_name(function):
+    """Return a readable name for a function, for use in stage keys.
+
+    >>> stage_name(len)
+    'len'
+    >>> from .op import lt
+    >>> stage_name(lt(3))
+    'lt(3)'
+    """
+    if isinstance(function, functools.partial):
+        # Operator expressions say what they do in their repr, where their
+        # names are only those of the shared generated function
+        return repr(function)
+    return (getattr(function, '__qualname__', None)
+            or getattr(function, '__name__', None)
+            or repr(function))
+
+
+def profiled(factory):
+    """Decorator for curried factories, to count and time the functions
+    they return while instrumentation is on.
+
+    Calls are recorded under the key ('module.factory', '(arguments)'), so
+    each distinct use of a factory gets its own line in the report.
+
+    When instrumentation is off, the module holds the undecorated factory,
+    so there's no overhead at all.  Turning it on swaps the profiling
+    factory into the module, so refer to factories through their module
+    (mappings.lookup rather than a lookup imported earlier) to see them.
+
+    >>> from . import mappings
+    >>> registry = enable(Registry())
+    >>> get_name = mappings.lookup('name')
+    >>> [get_name(person) for person in [{'name': 'fred'}, {}]]
+    ['fred', None]
+    >>> disable()
+    >>> get_name.__qualname__
+    'lookup.<locals>._lookup'
+    >>> registry.stats()[('mappings.lookup', "('name')")].calls
+    2
+    >>> mappings.lookup('name').__qualname__
+    'lookup.<locals>._lookup'
+
+    Only plain functions are wrapped.  Anything else the factory returns,
+    such as an op expression, is passed back as it is so its methods keep
+    working.
+    """
+    module = sys.modules[factory.__module__]
+    profiling = _profiling(factory)
+    def swap(enabled):
+        setattr(module, factory.__name__, profiling if enabled else factory)
+    on_toggle(swap)
+    return profiling if _enabled else factory
+
+
+def _profiling(factory):
+    combinator = '%s.%s' % (factory.__module__.split('.', 1)[-1],
+                            factory.__name__)
+    def profiling_factory(*args, **kwargs):
+        function = factory(*args, **kwargs)
+        if not isinstance(function, types.FunctionType):
+            return function
+        key = (combinator, _arguments_text(args, kwargs))
+        def profiled_call(*args, **kwargs):
+            started = timer()
+            result = function(*args, **kwargs)
+            registry.record(key, timer() - started)
+            return result
+        return functools.update_wrapper(profiled_call, function)
+    return functools.update_wrapper(profiling_factory, factory)
+
+
+def _arguments_text(args, kwargs):
+    """Describe the arguments a factory was called with, briefly.
+
+    >>> from .op import lt
+    >>> _arguments_text((len, lt(3), list(range(100))), {'default': 'x'})
+    "(len, lt(3), [0, 1, 2, 3, 4, 5, ...], default='x')"
+    """
+    parts = [_argument_text(arg) for arg in args]
+    parts += ['%s=%s' % (name, _argument_text(kwargs[name]))
+              for name in sorted(kwargs)]
+    return '(%s)' % ', '.join(parts)
+
+
+def _argument_text(value):
+    if callable(value):
+        return stage_name(value)
+    return _reprlib.repr(value)
+
+
+def _enable_from_environment(environ):
+    target = environ.get('FUNBOX_PROFILE')
+    if target:
+        enable()
+        atexit.register(_write_report, target)
+
+
+def _write_report(target):
+    if target == '1':
+        sys.stderr.write(registry.report() + '\n')
+    else:
+        with open(target, 'w') as output:
+            if target.endswith('.json'):
+                output.write(registry.as_json())
+            else:
+                output.write(registry.report() + '\n')
+
+
+_enable_from_environment(os.environ)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
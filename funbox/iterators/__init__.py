@@ -5,8 +5,8 @@
 
 import itertools
 from ..itertools_compat import ifilter, imap, ifilterfalse
+from .. import instrument as _instrument
 from .. import pairs
-import functools
 import warnings
 
 
@@ -130,6 +130,9 @@ def sift_strict(sieves, items):
     Note the much more marked difference between the two figures - add
     a little more than 0.1 of a second for each extra sieve.
 
+    To measure it yourself, the benchmark suite in the source tree has
+    both with six sieves: python -m benchmarks --only iterators
+
     If you're going to run this repeatedly over a million numbers, the
     improvements will soon stack up.
 
@@ -166,6 +169,7 @@ def sift_rest(x):
     return True
 
 
+@_instrument.profiled
 def imap_c(func):
     """imap_c(func)(iterable) = itertools.imap(func, iterable)
 
@@ -174,9 +178,12 @@ def imap_c(func):
     >>> list(imap_c(int)(['1', '2', '3']))
     [1, 2, 3]
     """
-    return functools.partial(imap, func)
+    def imap_func(iterable):
+        return imap(func, iterable)
+    return imap_func
 
 
+@_instrument.profiled
 def ifilter_c(func):
     """ifilter_c(func)(iterable) = itertools.ifilter(func, iterable)
 
@@ -185,7 +192,9 @@ def ifilter_c(func):
     >>> list(ifilter_c(lambda x: x % 2 == 0)([1, 2, 3, 4]))
     [2, 4]
     """
-    return functools.partial(ifilter, func)
+    def ifilter_func(iterable):
+        return ifilter(func, iterable)
+    return ifilter_func
 
 
 def concat(iterables):
@@ -3,26 +3,137 @@
 """Tools for dealing with lists and other addressable sequences
 """
 
+try:
+    from collections.abc import Sequence as _Sequence
+except ImportError:
+    # For Python 2 compatibility
+    from collections import Sequence as _Sequence
+
+import os as _os
+
+from . import _lazy
+from . import instrument as _instrument
 from . import validation
+from ._lazy import futures as _futures
 
-def all_but_last(n):
+@_instrument.profiled
+def all_but_last(n, view=False):
     """all_but_last(n)(sequence) => all but the last n items of the sequence
 
     >>> all_but_last(3)([1, 2, 3, 4, 5, 6, 7])
     [1, 2, 3, 4]
+
+    With view=True you get a SequenceView instead of a copy:
+
+    >>> all_but_last(3, view=True)([1, 2, 3, 4, 5, 6, 7])
+    SequenceView([1, 2, 3, 4])
     """
     if not validation.is_natural_number(n):
         raise ValueError("n must be an integer from 0 upwards, got %r" % (n,))
-    return lambda sequence : sequence[:-n]
+    if view:
+        def all_but_last_view(sequence):
+            return SequenceView(sequence)[:-n]
+        return all_but_last_view
+    def all_but_last_n(sequence):
+        return sequence[:-n]
+    return all_but_last_n
 
-def uncons(sequence):
+def uncons(sequence, view=False):
     """uncons(sequence) => (sequence[0], sequence[1:])
 
     >>> uncons([1, 2, 3, 4, 5])
     (1, [2, 3, 4, 5])
+
+    With view=True the tail is a SequenceView, so no copy is made.
+    This makes recursive head/tail processing O(n) instead of O(n^2):
+
+    >>> head, tail = uncons([1, 2, 3, 4, 5], view=True)
+    >>> head, tail
+    (1, SequenceView([2, 3, 4, 5]))
+    >>> uncons(tail)
+    (2, SequenceView([3, 4, 5]))
     """
+    if view:
+        sequence = SequenceView(sequence)
     return sequence[0], sequence[1:]
 
+class SequenceView(_Sequence):
+    """A read-only view onto a slice of a sequence, without copying it.
+
+    Works with anything that supports len() and integer indexing, e.g.
+    lists, tuples, str, bytes and memoryviews.
+
+    Slicing a view gives you another view onto the same underlying sequence.
+
+    >>> nums = list(range(10))
+    >>> v = SequenceView(nums)[2:8]
+    >>> v
+    SequenceView([2, 3, 4, 5, 6, 7])
+    >>> len(v), v[0], v[-1]
+    (6, 2, 7)
+    >>> v[::2]
+    SequenceView([2, 4, 6])
+    >>> v[::-1][1:3]
+    SequenceView([6, 5])
+    >>> 5 in v, v.index(5)
+    (True, 3)
+    >>> list(SequenceView(b'abc')[1:]) == [ord('b'), ord('c')]
+    True
+
+    Note the view reflects later changes to the underlying sequence:
+
+    >>> nums[2] = 'two'
+    >>> v[0]
+    'two'
+    """
+    __slots__ = ('_sequence', '_start', '_step', '_length')
+
+    def __init__(self, sequence):
+        if isinstance(sequence, SequenceView):
+            self._sequence = sequence._sequence
+            self._start = sequence._start
+            self._step = sequence._step
+            self._length = sequence._length
+        else:
+            self._sequence = sequence
+            self._start = 0
+            self._step = 1
+            self._length = len(sequence)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._slice(index)
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("SequenceView index out of range")
+        return self._sequence[self._start + index * self._step]
+
+    def __iter__(self):
+        sequence = self._sequence
+        start = self._start
+        step = self._step
+        for i in range(self._length):
+            yield sequence[start + i * step]
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, list(self))
+
+    def _slice(self, index):
+        start, stop, step = index.indices(self._length)
+        if step > 0:
+            length = max(0, (stop - start + step - 1) // step)
+        else:
+            length = max(0, (start - stop - step - 1) // -step)
+        new = SequenceView(self)
+        new._start = self._start + start * self._step
+        new._step = self._step * step
+        new._length = length
+        return new
+
 def categorise(functions, unique=False):
     """categorise(functions, unique=False)(sequence) - Split up a sequence according to functions.
 
@@ -48,19 +159,88 @@ def categorise(functions, unique=False):
     [[3, 6, 9], [2, 4, 8, 10], [1, 5, 7]]
     """
     def categorise_functions(sequence):
+        return _categorise_chunk(functions, unique, sequence)
+    return categorise_functions
+
+def categorise_parallel(functions, unique=False, threshold=10000,
+                        chunk_size=None, max_workers=None,
+                        use_processes=False, executor=None):
+    """categorise_parallel(functions, unique=False, ...)(sequence) - Parallel categorise.
+
+    Like categorise, but splits the sequence into chunks and categorises
+    each chunk in a thread or process pool, then concatenates the
+    per-category results so they stay in input order.
+
+    Worth it when the predicates are expensive.  Sequences shorter than
+    threshold are categorised serially, as the pool overhead would
+    outweigh any gain.
+
+    threshold: Minimum length of sequence before going parallel.
+    chunk_size: Items per chunk.  Defaults to an even split over the workers.
+    max_workers: Passed to the executor if we create one, and used to size
+                 chunks.  Defaults to the number of CPUs.
+    use_processes: Use a ProcessPoolExecutor instead of a ThreadPoolExecutor.
+                   The functions must then be picklable (so no lambdas).
+    executor: An existing concurrent.futures executor to use instead.
+
+    >>> even = lambda x: x % 2 == 0
+    >>> multiple_of_3 = lambda x : x % 3 == 0
+    >>> nums = list(range(1, 11))
+    >>> categorise_parallel([even, multiple_of_3], threshold=0, chunk_size=3)(nums)
+    [[2, 4, 6, 8, 10], [3, 6, 9], [1, 5, 7]]
+    >>> categorise_parallel([even, multiple_of_3], unique=True, threshold=0, chunk_size=3)(nums)
+    [[2, 4, 6, 8, 10], [3, 9], [1, 5, 7]]
+    >>> categorise_parallel([even])(nums)   # below threshold, so serial
+    [[2, 4, 6, 8, 10], [1, 3, 5, 7, 9]]
+    """
+    def categorise_functions_parallel(sequence):
+        if not hasattr(sequence, '__getitem__') or not hasattr(sequence, '__len__'):
+            sequence = list(sequence)
+        if len(sequence) < max(threshold, 1):
+            return _categorise_chunk(functions, unique, sequence)
+        if executor is not None:
+            return _categorise_in(executor, sequence)
+        if not _lazy.available(_futures):
+            raise RuntimeError("categorise_parallel needs concurrent.futures")
+        pool_class = (_futures.ProcessPoolExecutor if use_processes
+                      else _futures.ThreadPoolExecutor)
+        pool = pool_class(max_workers=max_workers)
+        try:
+            return _categorise_in(pool, sequence)
+        finally:
+            pool.shutdown()
+
+    def _categorise_in(pool, sequence):
+        size = chunk_size
+        if not size:
+            workers = max_workers or _os.cpu_count() or 4
+            size = -(-len(sequence) // workers)
+        chunks = [sequence[i:i + size] for i in range(0, len(sequence), size)]
         out_lists = [list() for i in range(len(functions) + 1)]
-        for item in sequence:
-            caught = False
-            for idx, fun in enumerate(functions):
-                if fun(item):
-                    out_lists[idx].append(item)
-                    caught = True
-                    if unique:
-                        break
-            if not caught:
-                out_lists[-1].append(item)
+        results = pool.map(_categorise_chunk,
+                           [functions] * len(chunks),
+                           [unique] * len(chunks),
+                           chunks)
+        for chunk_lists in results:
+            for out_list, chunk_list in zip(out_lists, chunk_lists):
+                out_list.extend(chunk_list)
         return out_lists
-    return categorise_functions
+
+    return categorise_functions_parallel
+
+def _categorise_chunk(functions, unique, sequence):
+    out_lists = [list() for i in range(len(functions) + 1)]
+    for item in sequence:
+        caught = False
+        for idx, fun in enumerate(functions):
+            if fun(item):
+                out_lists[idx].append(item)
+                caught = True
+                if unique:
+                    break
+        if not caught:
+            out_lists[-1].append(item)
+    return out_lists
 
 if __name__ == "__main__":
     import doctest
@@ -21,9 +21,11 @@ docstrings e.g. to_dict(funs)(an_object).  These don't necessarily have a _c suf
 
 from .itertools_compat import izip
 import operator
-from functional import partial
+from functools import partial
 from .flogic import fnot
+from . import instrument as _instrument
 
+@_instrument.profiled
 def to_dict(funs):
     """Convert an object to a dict using a dictionary of functions.
 
@@ -56,6 +58,7 @@ def to_dict(funs):
     return to_dict_funs
 
 
+@_instrument.profiled
 def with_calculated(funs):
     """Return a new dict which is a_dict updated according to the dictionary funs.
 
@@ -106,6 +109,7 @@ def updated_with(orig_dict, *new_values):
             newdict.update(vals)
     return newdict
 
+@_instrument.profiled
 def pull_key(key_fun):
     """Return a new dict with members of objs as values and values generated by key_fun as keys.
 
@@ -147,13 +151,17 @@ def map_values(fun, a_dict):
     """
     return dict((k, fun(v)) for (k, v) in a_dict.items())
 
+@_instrument.profiled
 def map_values_c(fun):
     """Curried version of map_values.
 
     map_values_c(fun)(a_dict) = map_values(fun, a_dict)
     """
-    return partial(map_values, fun)
+    def map_values_fun(a_dict):
+        return map_values(fun, a_dict)
+    return map_values_fun
 
+@_instrument.profiled
 def coerce_values(spec):
     """coerce_values(spec)(indict) : change some values of indict
 
@@ -171,6 +179,7 @@ def coerce_values(spec):
         return outdict
     return _coerce_values
 
+@_instrument.profiled
 def without_keys(keys):
     """Return a copy of a_dict with the given keys removed.
 
@@ -196,13 +205,17 @@ def filter_keys(func, a_dict):
     """
     return dict((k, v) for (k, v) in a_dict.items() if func(k))
 
+@_instrument.profiled
 def filter_keys_c(func):
     """Curried filter_keys.
 
     filter_keys_c(f)(a_dict) = filter_keys(f, a_dict)
     """
-    return partial(filter_keys, func)
+    def filter_keys_func(a_dict):
+        return filter_keys(func, a_dict)
+    return filter_keys_func
 
+@_instrument.profiled
 def row_to_dict(keys):
     """row_to_dict(keys)(row) => Dictionary built from a row of data.
 
@@ -221,15 +234,20 @@ def row_to_dict(keys):
     >>> (d['forename'], d['surname'])
     ('Fred', 'Bloggs')
     """
-    return lambda row: dict(izip(keys, row))
+    def row_to_dict_keys(row):
+        return dict(izip(keys, row))
+    return row_to_dict_keys
 
+@_instrument.profiled
 def dict_to_row(keys):
     """dict_to_row(keys)(adict) => Row of data containing values of given keys from adict
 
     >>> dict_to_row(['a', 'c', 'b'])({'a': 1, 'b': 2, 'c': 3, 'd': 4})
     [1, 3, 2]
     """
-    return lambda adict: [adict[k] for k in keys]
+    def dict_to_row_keys(adict):
+        return [adict[k] for k in keys]
+    return dict_to_row_keys
 
 def flat_items(adict):
     """Generate triples with one level of nested keys and values.
@@ -257,6 +275,7 @@ def iteritems(adict):
         return adict.items()
 
 
+@_instrument.profiled
 def lookup(key, default=None):
     """lookup(k, default=None)(mapping) -> mapping.get(k, default)
 
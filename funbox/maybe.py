@@ -5,8 +5,13 @@ function in the pipeline can return None, in which case the
 whole computation must return None.
 
 It should work on Python 2.7 or Python 3.
+
+Per-stage call counts, short-circuits and timings can be recorded by
+turning on funbox.instrument.
 """
 
+from . import instrument as _instrument
+
 def maybe(value, *functions):
     """Return result of applying successive functions to a value.
 
@@ -61,17 +66,55 @@ def odoo_maybe(value, *functions):
     >>> odoo_maybe(None, lookup('a'), send('rstrip'))
     >>> odoo_maybe(False, lookup('a'), send('rstrip'))
     False
+
+    Nulls are checked by identity, so 0 isn't mistaken for False:
+
+    >>> odoo_maybe(0, str)
+    '0'
     """
     return _gen_maybe((None, False), value, functions)
 
-def _gen_maybe(nulls, value, functions):
+def _gen_maybe_plain(nulls, value, functions):
     for fun in functions:
-        if value in nulls:
+        for null in nulls:
+            if value is null:
+                return value
+        value = fun(value)
+    return value
+
+def _gen_maybe_traced(nulls, value, functions):
+    names = ['%d:%s' % (position, _instrument.stage_name(fun))
+             for position, fun in enumerate(functions, 1)]
+    return _trace_maybe(_combinator_name(nulls), names, nulls, value, functions)
+
+def _trace_maybe(combinator, names, nulls, value, functions):
+    registry = _instrument.registry
+    timer = _instrument.timer
+    is_null = any(value is null for null in nulls)
+    registry.record((combinator, '0:<input>'), 0.0, short_circuit=is_null)
+    if is_null:
+        return value
+    last = len(functions)
+    for position, (name, fun) in enumerate(zip(names, functions), 1):
+        started = timer()
+        value = fun(value)
+        elapsed = timer() - started
+        is_null = position < last and any(value is null for null in nulls)
+        registry.record((combinator, name), elapsed, short_circuit=is_null)
+        if is_null:
             return value
-        else:
-            value = fun(value)
     return value
 
+def _combinator_name(nulls):
+    return 'odoo_maybe' if nulls == (None, False) else 'maybe'
+
+def _set_tracing(enabled):
+    global _gen_maybe
+    _gen_maybe = _gen_maybe_traced if enabled else _gen_maybe_plain
+
+_gen_maybe = _gen_maybe_plain
+_instrument.on_toggle(_set_tracing)
+
 def maybe_c(*functions):
     """maybe_c(*functions)(value) -> maybe(value, *functions)
 
@@ -84,15 +127,122 @@ def maybe_c(*functions):
     ...     [{'a': 'abc  '}, {}, None]
     ... ))
     ['abc', None, None]
+
+    The pipeline is compiled once into a single function, so it's cheap to
+    apply many times.  It also has an apply_many method for whole sequences:
+
+    >>> maybe_c(lookup('a'), send('rstrip')).apply_many(
+    ...     [{'a': 'abc  '}, {}, None]
+    ... )
+    ['abc', None, None]
     """
-    return lambda value: maybe(value, *functions)
+    return _compile_maybe(functions, (None,), 'maybe_c')
 
 def odoo_maybe_c(*functions):
     """odoo_maybe_c(*functions)(value) -> odoo_maybe(value, *functions)
 
     Curried, so suitable for use as arguments to higher-order functions.
+
+    >>> from operator import methodcaller as send
+    >>> odoo_maybe_c(send('rstrip')).apply_many(['abc  ', False, None])
+    ['abc', False, None]
+    """
+    return _compile_maybe(functions, (None, False), 'odoo_maybe_c')
+
+def compile_maybe(functions, nulls=(None,)):
+    """Compile a maybe pipeline into a single specialised function.
+
+    compile_maybe(functions, nulls)(value) is like maybe(value, *functions),
+    but treats any of the objects in nulls as null values (by identity).
+
+    The returned function has an apply_many(values) method returning a list
+    of results, with the loop over values inlined into the generated code.
+
+    >>> pipeline = compile_maybe([str.strip, str.upper], nulls=(None, ''))
+    >>> pipeline(' abc ')
+    'ABC'
+    >>> pipeline.apply_many([' a ', None, '', 'b'])
+    ['A', None, '', 'B']
+    >>> pipeline.functions
+    (<method 'strip' of 'str' objects>, <method 'upper' of 'str' objects>)
+    >>> pipeline.__qualname__
+    'compile_maybe.<locals>.maybe_pipeline'
     """
-    return lambda value: odoo_maybe(value, *functions)
+    return _compile_maybe(functions, nulls, 'compile_maybe')
+
+def _compile_maybe(functions, nulls, factory):
+    # factory: Name of the public function, for the pipeline's __qualname__.
+    # While instrumentation is on, pipelines trace their stages, apply_many
+    # included, so the factories aren't wrapped by instrument.profiled too.
+    functions = tuple(functions)
+    nulls = tuple(nulls)
+    if _instrument.is_enabled():
+        return _traced_pipeline(functions, nulls, factory)
+    null_names = tuple(
+        repr(null) if null is None or null is False or null is True
+        else '_n%d' % i
+        for i, null in enumerate(nulls)
+    )
+    key = (len(functions), null_names)
+    make = _PIPELINE_FACTORIES.get(key)
+    if make is None:
+        make = _PIPELINE_FACTORIES[key] = _pipeline_factory(*key)
+    pipeline, apply_many = make(*functions + nulls)
+    pipeline.__qualname__ = '%s.<locals>.maybe_pipeline' % factory
+    apply_many.__qualname__ = '%s.<locals>.apply_many' % factory
+    pipeline.apply_many = apply_many
+    pipeline.functions = functions
+    pipeline.nulls = nulls
+    return pipeline
+
+def _traced_pipeline(functions, nulls, factory):
+    combinator = _combinator_name(nulls)
+    names = ['%d:%s' % (position, _instrument.stage_name(fun))
+             for position, fun in enumerate(functions, 1)]
+    def maybe_pipeline(value):
+        return _trace_maybe(combinator, names, nulls, value, functions)
+    def apply_many(values):
+        return list(map(maybe_pipeline, values))
+    maybe_pipeline.__qualname__ = '%s.<locals>.maybe_pipeline' % factory
+    apply_many.__qualname__ = '%s.<locals>.apply_many' % factory
+    maybe_pipeline.apply_many = apply_many
+    maybe_pipeline.functions = functions
+    maybe_pipeline.nulls = nulls
+    return maybe_pipeline
+
+# Generated pipeline factories, keyed by (number of functions, null names).
+_PIPELINE_FACTORIES = {}
+
+def _pipeline_factory(length, null_names):
+    is_null = ' or '.join('value is %s' % name for name in null_names) or 'False'
+    args = ['_f%d' % i for i in range(length)] + ['_n%d' % i for i in range(len(null_names))]
+    single = []
+    many = []
+    for i in range(length):
+        single.append('        if %s:\n            return value\n' % is_null)
+        single.append('        value = _f%d(value)\n' % i)
+        many.append('            while True:\n' if i == 0 else '')
+        many.append('                if %s:\n                    break\n' % is_null)
+        many.append('                value = _f%d(value)\n' % i)
+    if length:
+        many.append('                break\n')
+    code = (
+        'def _make(%s):\n'
+        '    def maybe_pipeline(value):\n'
+        '%s'
+        '        return value\n'
+        '    def apply_many(values):\n'
+        '        results = []\n'
+        '        append = results.append\n'
+        '        for value in values:\n'
+        '%s'
+        '            append(value)\n'
+        '        return results\n'
+        '    return maybe_pipeline, apply_many\n'
+    ) % (', '.join(args), ''.join(single), ''.join(many))
+    namespace = {}
+    exec(code, namespace)
+    return namespace['_make']
 
 
 if __name__ == '__main__':
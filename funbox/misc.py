@@ -3,6 +3,9 @@
 """Miscellaneous useful functions.
 """
 
+from . import instrument as _instrument
+
+@_instrument.profiled
 def always(value):
     """always(value)(*args, **kwargs) always returns value
 
@@ -11,7 +14,9 @@ def always(value):
     >>> always('foo')('fe', 'fi', 0xf0, akw='fum')
     'foo'
     """
-    return lambda *args, **kwargs : value
+    def always_value(*args, **kwargs):
+        return value
+    return always_value
 
 if __name__ == "__main__":
     import doctest
@@ -19,7 +19,6 @@ library instead.
 
 import logging
 
-logging.basicConfig()
 _logger = logging.getLogger(__name__)
 
 class Once(object):
@@ -60,8 +59,9 @@ class Once(object):
     >>> # That time APPLE was only calculated once, but was used many times
     """
     def __init__(self, function, *args, **kwargs):
-        _logger.debug('args = %r' % (args,))
-        _logger.debug('kwargs = %r' % (kwargs,))
+        if _logger.isEnabledFor(logging.DEBUG):
+            _logger.debug('args = %r', args)
+            _logger.debug('kwargs = %r', kwargs)
         self._function = function
         self._args = args
         self._kwargs = kwargs
@@ -75,5 +75,6 @@ if __name__ == "__main__":
     import doctest
     import os
     if os.getenv('DEBUG'):
+        logging.basicConfig()
         _logger.setLevel(logging.DEBUG)
     doctest.testmod()
@@ -9,7 +9,6 @@ something more than a simple list comprehension it's worth having this
 kind of abstraction.
 
 >>> from datetime import date
->>> from functional import compose
 >>> from operator import attrgetter
 >>> from .iterators import partition
 >>> today = date(2014, 7, 13)
@@ -22,10 +21,422 @@ kind of abstraction.
 [datetime.date(2014, 7, 1)]
 >>> list(newer)
 [datetime.date(2014, 7, 12)]
+
+
+Operator expressions
+====================
+
+The functions here don't return opaque lambdas, but small callable Expr
+objects which record the operator and operand, so they can be inspected:
+
+>>> lt(3)
+lt(3)
+>>> lt(3).operator, lt(3).operand
+('lt', 3)
+
+They combine with &, | and ~, and with compose():
+
+>>> between = gt(1) & lt(5)
+>>> between
+(gt(1) & lt(5))
+>>> list(filter(between, [0, 1, 2, 3, 4, 5, 6]))
+[2, 3, 4]
+>>> list(filter(~between | eq(3), [0, 1, 2, 3, 4, 5, 6]))
+[0, 1, 3, 5, 6]
+>>> list(map(compose(mul(10), add(1)), [1, 2, 3]))
+[20, 30, 40]
+
+A composed expression is compiled into a single generated function when it's
+built, so applying it doesn't go through one Python call per operator.
+Use .compile() to get that function directly for hot loops:
+
+>>> fast = between.compile()
+>>> list(filter(fast, [0, 1, 2, 3, 4, 5, 6]))
+[2, 3, 4]
+
+apply_array() evaluates an expression over a whole NumPy array or
+array.array at once (with & | ~ applied elementwise).  NumPy is used if it's
+installed, otherwise it falls back to a list of per-item results:
+
+>>> from array import array
+>>> [bool(b) for b in between.apply_array(array('i', [0, 2, 4, 6]))]
+[False, True, True, False]
 """
 
 from __future__ import division
 from functools import partial
+import re as _re
+
+from . import _lazy
+from ._lazy import numpy as _numpy
+
+class Expr(partial):
+    """A callable operator expression.
+
+    You don't normally construct these directly, they're returned by
+    the functions in this module, and by combining those with
+    &, |, ~ and compose().
+
+    operator: Name of the operation, e.g. 'lt', 'and' or 'compose'
+    operands: Tuple of operands.  For the simple curried operators this is
+              the single fixed argument.
+
+    Each kind of expression is a subclass providing _source(), which
+    returns the Python source for the expression.  Expressions are
+    partial objects wrapping a function generated from that source, with
+    the constants as its leading arguments, so calling one runs a single
+    Python function.  The function is shared by all expressions of the
+    same shape.
+
+    Expressions pickle by rebuilding them from their operands, so they can
+    be sent to worker processes:
+
+    >>> import pickle
+    >>> pickle.loads(pickle.dumps(gt(1) & ~eq(3)))(2)
+    True
+
+    Expressions take their names from the generated function:
+
+    >>> lt(3).__name__, lt(3).__qualname__
+    ('lt_expr', 'lt.<locals>.lt_expr')
+    """
+    operator = None
+    operands = ()
+    # Where the expression comes from, for generated functions' __qualname__
+    _factory = 'Expr'
+
+    def __new__(cls, *args):
+        return partial.__new__(cls, _unbuilt)
+
+    def __and__(self, other):
+        return _And(self, other)
+
+    def __or__(self, other):
+        return _Or(self, other)
+
+    def __invert__(self):
+        return _Not(self)
+
+    def compose(self, *functions):
+        """expr.compose(f, g)(x) = expr(f(g(x)))
+        """
+        return compose(self, *functions)
+
+    def compile(self):
+        """Return a single generated function equivalent to this expression.
+
+        >>> (gt(1) & lt(5)).compile().__qualname__
+        'Expr.__and__.<locals>.and_expr'
+        """
+        compiled = self.__dict__.get('_compiled')
+        if compiled is None:
+            compiled = self._compiled = _compile(self, vector=False)
+        return compiled
+
+    def vectorise(self):
+        """Return a generated function for applying this to whole arrays.
+
+        Like compile(), but with and, or and not done elementwise, giving
+        the same values item by item as compile() does.  Where both sides
+        are comparisons that's just & | ~; otherwise and and or pick whole
+        values with numpy.where, as the scalar operators do.
+
+        Plain functions in the expression can't be given a whole array, so
+        if there are any the function applies the expression item by item.
+        """
+        compiled = self.__dict__.get('_vectorised')
+        if compiled is None:
+            if self._calls():
+                compiled = _elementwise(self.compile())
+            else:
+                compiled = _compile(self, vector=True)
+            self._vectorised = compiled
+        return compiled
+
+    def apply_array(self, values):
+        """Apply this expression to every item of an array at once.
+
+        values: A NumPy array, array.array, or other sequence.
+
+        Returns a NumPy array if NumPy is available, otherwise a list.
+
+        Plain functions in the expression are applied item by item:
+
+        >>> from array import array
+        >>> ' '.join(compose(str, add(1)).apply_array(array('i', [0, 1, 2])))
+        '1 2 3'
+
+        and, or and not give the same values as applying the expression to
+        each item, even when the operands aren't comparisons:
+
+        >>> numbers = array('i', [-1, 0, 2])
+        >>> [int(value) for value in (add(1) & add(2)).apply_array(numbers)]
+        [0, 2, 4]
+        >>> [(add(1) & add(2))(number) for number in numbers]
+        [0, 2, 4]
+        >>> [bool(value) for value in (~add(1)).apply_array(numbers)]
+        [True, False, False]
+        """
+        if _lazy.has_numpy():
+            return self.vectorise()(_numpy.asarray(values))
+        return list(map(self.compile(), values))
+
+    def _calls(self):
+        """Whether the expression wraps any plain functions.
+        """
+        return any(operand._calls() for operand in self.operands)
+
+    def _boolean(self):
+        """Whether the expression always gives a bool (array, in vector
+        mode), so & | ~ do the same as and, or, not.
+        """
+        return False
+
+
+def compose(*functions):
+    """compose(f, g, h)(x) = f(g(h(x)))
+
+    Functions can be Expr objects or any other callable taking one argument.
+    The result is an Expr, so it's compiled into a single function.
+
+    >>> compose(add(1), mul(2))(5)
+    11
+    >>> compose(str, add(1))(5)
+    '6'
+    """
+    if not functions:
+        raise TypeError("compose needs at least one function")
+    exprs = [_as_expr(f) for f in functions]
+    result = exprs[-1]
+    for outer in reversed(exprs[:-1]):
+        result = _Compose(outer, result)
+    return result
+
+
+class _BinOp(Expr):
+    def __init__(self, operator, template, operand):
+        self.operator = operator
+        self.operands = (operand,)
+        self._template = template
+        _specialise(self)
+
+    @property
+    def operand(self):
+        return self.operands[0]
+
+    @property
+    def _factory(self):
+        return self.operator
+
+    def __repr__(self):
+        return '%s(%r)' % (self.operator, self.operand)
+
+    def __reduce__(self):
+        return (_BinOp, (self.operator, self._template, self.operand))
+
+    def _calls(self):
+        return False
+
+    def _boolean(self):
+        return self.operator in _COMPARISONS
+
+    def _source(self, var, emitter, vector):
+        return self._template.format(x=var, y=emitter.const(self.operand))
+
+
+class _Call(Expr):
+    """Wraps an arbitrary callable so it can take part in an expression.
+    """
+    operator = 'call'
+    _factory = 'compose'
+
+    def __init__(self, function):
+        self.operands = (function,)
+        _specialise(self)
+
+    def __repr__(self):
+        return repr(self.operands[0])
+
+    def __reduce__(self):
+        return (_Call, self.operands)
+
+    def _calls(self):
+        return True
+
+    def _source(self, var, emitter, vector):
+        return '%s(%s)' % (emitter.const(self.operands[0]), var)
+
+
+class _And(Expr):
+    operator = 'and'
+    _logic = ('and', '&')
+    _factory = 'Expr.__and__'
+
+    def __init__(self, left, right):
+        self.operands = (_as_expr(left), _as_expr(right))
+        _specialise(self)
+
+    def __repr__(self):
+        return '(%r %s %r)' % (self.operands[0], self._logic[1], self.operands[1])
+
+    def __reduce__(self):
+        return (_And, self.operands)
+
+    def _boolean(self):
+        return all(operand._boolean() for operand in self.operands)
+
+    def _source(self, var, emitter, vector):
+        left, right = [operand._source(var, emitter, vector)
+                       for operand in self.operands]
+        if not vector or self._boolean():
+            return '(%s %s %s)' % (left, self._logic[vector], right)
+        # x and y is y if x is true, otherwise x; x or y is the other way
+        # round.  numpy.where picks items the same way.
+        temp = emitter.temp()
+        chosen = (right, temp) if self.operator == 'and' else (temp, right)
+        return '(lambda %s: %s(%s, %s, %s))(%s)' % (
+            temp, emitter.const(_numpy.where), temp, chosen[0], chosen[1], left)
+
+
+class _Or(_And):
+    operator = 'or'
+    _logic = ('or', '|')
+    _factory = 'Expr.__or__'
+
+    def __reduce__(self):
+        return (_Or, self.operands)
+
+
+class _Not(Expr):
+    operator = 'not'
+    _factory = 'Expr.__invert__'
+
+    def __init__(self, operand):
+        self.operands = (_as_expr(operand),)
+        _specialise(self)
+
+    def __repr__(self):
+        return '~%r' % (self.operands[0],)
+
+    def __reduce__(self):
+        return (_Not, self.operands)
+
+    def _boolean(self):
+        return True
+
+    def _source(self, var, emitter, vector):
+        operand = self.operands[0]
+        source = operand._source(var, emitter, vector)
+        if not vector:
+            return '(not %s)' % (source,)
+        if operand._boolean():
+            return '(~%s)' % (source,)
+        return '%s(%s)' % (emitter.const(_numpy.logical_not), source)
+
+
+class _Compose(Expr):
+    operator = 'compose'
+    _factory = 'compose'
+
+    def __init__(self, outer, inner):
+        self.operands = (outer, inner)
+        _specialise(self)
+
+    def __repr__(self):
+        return 'compose(%r, %r)' % self.operands
+
+    def __reduce__(self):
+        return (_Compose, self.operands)
+
+    def _boolean(self):
+        return self.operands[0]._boolean()
+
+    def _source(self, var, emitter, vector):
+        outer, inner = self.operands
+        inner_source = inner._source(var, emitter, vector)
+        temp = emitter.temp()
+        outer_source = outer._source(temp, emitter, vector)
+        pattern = _re.compile(r'\b%s\b' % temp)
+        if len(pattern.findall(outer_source)) <= 1:
+            # Substitute the inner expression straight in
+            return pattern.sub(lambda match: inner_source, outer_source)
+        # The outer expression uses its argument more than once, so bind the
+        # inner result to a name to avoid evaluating it repeatedly.
+        return '(lambda %s: %s)(%s)' % (temp, outer_source, inner_source)
+
+
+class _Emitter(object):
+    def __init__(self):
+        self.constants = {}
+        self._temps = 0
+
+    def const(self, value):
+        name = '_c%d' % len(self.constants)
+        self.constants[name] = value
+        return name
+
+    def temp(self):
+        self._temps += 1
+        return '_t%d' % self._temps
+
+
+_COMPARISONS = frozenset(['lt', 'le', 'gt', 'ge', 'eq', 'ne'])
+
+# Generated factories, keyed by source code.  The source only depends on the
+# shape of an expression, not on its operands, so this stays small.
+_FACTORIES = {}
+
+# Generated functions for calling expressions, keyed by source code.
+_CALLERS = {}
+
+def _as_expr(function):
+    return function if isinstance(function, Expr) else _Call(function)
+
+def _compile(expr, vector):
+    emitter = _Emitter()
+    body = expr._source('x', emitter, vector)
+    names = sorted(emitter.constants)
+    code = 'def _make(%s):\n    def %s(x):\n        return %s\n    return %s\n' % (
+        ', '.join(names), expr.operator + '_expr', body, expr.operator + '_expr')
+    make = _FACTORIES.get(code)
+    if make is None:
+        namespace = {}
+        exec(code, namespace)
+        make = _FACTORIES[code] = namespace['_make']
+    compiled = make(*[emitter.constants[n] for n in names])
+    compiled.__doc__ = repr(expr)
+    compiled.__qualname__ = '%s.<locals>.%s' % (expr._factory, compiled.__name__)
+    return compiled
+
+def _specialise(expr):
+    """Point expr at the generated function for its shape, with its
+    constants as the partial's arguments.
+    """
+    emitter = _Emitter()
+    body = expr._source('x', emitter, False)
+    names = sorted(emitter.constants)
+    code = 'def %s(%s):\n    return %s\n' % (
+        expr.operator + '_expr', ', '.join(names + ['x']), body)
+    function = _CALLERS.get(code)
+    if function is None:
+        namespace = {}
+        exec(code, namespace)
+        function = _CALLERS[code] = namespace[expr.operator + '_expr']
+        function.__qualname__ = '%s.<locals>.%s' % (expr._factory,
+                                                    function.__name__)
+    constants = tuple(emitter.constants[name] for name in names)
+    # Named like the function, so tools that label callables by name work
+    expr.__name__ = function.__name__
+    expr.__qualname__ = function.__qualname__
+    partial.__setstate__(expr, (function, constants, None, expr.__dict__))
+
+def _unbuilt(x):
+    raise TypeError("expression used before it was built")
+
+def _elementwise(function):
+    def apply_elementwise(values):
+        return _numpy.array([function(value) for value in values])
+    return apply_elementwise
 
 def lt(y):
     """lt(y)(x) = x < y
@@ -33,7 +444,7 @@ def lt(y):
     >>> list(filter(lt(3), [1,2,3,4,5]))
     [1, 2]
     """
-    return lambda x : x < y
+    return _BinOp('lt', '({x} < {y})', y)
 
 def le(y):
     """le(y)(x) = x <= y
@@ -41,7 +452,7 @@ def le(y):
     >>> list(filter(le(3), [1,2,3,4,5]))
     [1, 2, 3]
     """
-    return lambda x : x <= y
+    return _BinOp('le', '({x} <= {y})', y)
 
 def gt(y):
     """gt(y)(x) = x > y
@@ -49,7 +460,7 @@ def gt(y):
     >>> list(filter(gt(3), [1,2,3,4,5]))
     [4, 5]
     """
-    return lambda x : x > y
+    return _BinOp('gt', '({x} > {y})', y)
 
 def ge(y):
     """ge(y)(x) = x > y
@@ -57,7 +468,7 @@ def ge(y):
     >>> list(filter(ge(3), [1,2,3,4,5]))
     [3, 4, 5]
     """
-    return lambda x : x >= y
+    return _BinOp('ge', '({x} >= {y})', y)
 
 def eq(y):
     """eq(y)(x) = x == y
@@ -65,7 +476,7 @@ def eq(y):
     >>> list(filter(eq(3), [1,2,3,4,5]))
     [3]
     """
-    return lambda x : x == y
+    return _BinOp('eq', '({x} == {y})', y)
 
 def ne(y):
     """eq(y)(x) = x != y
@@ -73,7 +484,7 @@ def ne(y):
     >>> list(filter(ne(3), [1,2,3,4,5]))
     [1, 2, 4, 5]
     """
-    return lambda x : x != y
+    return _BinOp('ne', '({x} != {y})', y)
 
 def add(y):
     """add(y)(x) = x + y
@@ -83,7 +494,7 @@ def add(y):
     >>> add(2)(3)
     5
     """
-    return lambda x : x + y
+    return _BinOp('add', '({x} + {y})', y)
 
 def mul(y):
     """mul(y)(x) = x * y
@@ -95,7 +506,7 @@ def mul(y):
     >>> mul(5)('a')
     'aaaaa'
     """
-    return lambda x : x * y
+    return _BinOp('mul', '({x} * {y})', y)
 
 def take_away(y):
     """take_away(y)(x) = x - y
@@ -106,7 +517,7 @@ def take_away(y):
     >>> list(map(take_away(2), [1,2,3,4,5]))
     [-1, 0, 1, 2, 3]
     """
-    return lambda x : x - y
+    return _BinOp('take_away', '({x} - {y})', y)
 
 def take_away_from(y):
     """take_away_from(y)(x) = y - x
@@ -117,7 +528,7 @@ def take_away_from(y):
     >>> list(map(take_away_from(2), [1,2,3,4,5]))
     [1, 0, -1, -2, -3]
     """
-    return lambda x : y - x
+    return _BinOp('take_away_from', '({y} - {x})', y)
 
 def divide_by(y):
     """divide_by(y)(x) = x / y
@@ -137,7 +548,7 @@ def divide_by(y):
     >>> flip(divide_by)(5)(2)
     2.5
     """
-    return lambda x : x / y
+    return _BinOp('divide_by', '({x} / {y})', y)
 
 def intdiv_by(y):
     """intdiv_by(y)(x) = x // y
@@ -154,7 +565,7 @@ def intdiv_by(y):
     >>> flip(intdiv_by)(5)(2)
     2
     """
-    return lambda x : x // y
+    return _BinOp('intdiv_by', '({x} // {y})', y)
 
 def divmod_by(y):
     """divmod_by(y)(x) = divmod(x, y)
@@ -171,7 +582,7 @@ def divmod_by(y):
     >>> flip(divmod_by)(5)(2)
     (2, 1)
     """
-    return lambda x : divmod(x, y)
+    return _BinOp('divmod_by', 'divmod({x}, {y})', y)
 
 def modulo(y):
     """modulo(y)(x) = x % y
@@ -188,7 +599,7 @@ def modulo(y):
     >>> flip(modulo)(5)(2)
     1
     """
-    return lambda x : x % y
+    return _BinOp('modulo', '({x} % {y})', y)
 
 def fmt(obj):
     """fmt(obj)(form) = form % obj
@@ -202,7 +613,7 @@ def fmt(obj):
     If you want to format lots of objects according to the same spec,
     use format_as.
     """
-    return lambda format_string : format_string % obj
+    return _BinOp('fmt', '({x} % {y})', obj)
 
 def format_as(format_string):
     """format_as(form)(obj) = form % obj
@@ -211,8 +622,11 @@ def format_as(format_string):
 
     >>> list(map(format_as("0x%x"), [0, 1, 10, 11, 15]))
     ['0x0', '0x1', '0xa', '0xb', '0xf']
+
+    To write lots of formatted records straight to a file, without building
+    a string per record, use funbox.sinks.FormatSink(target, format_as(form)).
     """
-    return lambda obj : format_string % obj
+    return _BinOp('format_as', '({y} % {x})', format_string)
 
 if __name__ == "__main__":
     import doctest
@@ -9,6 +9,13 @@ indexable sequences, or sequences of length other than two,
 but please don't rely on it remaining so in the future.
 """
 
+import array
+import heapq
+import operator
+
+from . import instrument as _instrument
+from .itertools_compat import imap, izip
+
 def fst(pair):
     """Return the first element of pair
     """
@@ -19,19 +26,25 @@ def snd(pair):
     """
     return pair[1]
 
+@_instrument.profiled
 def lift_fst(f):
     """Lift a function f onto the first element of a 2-tuple.
     >>> lift_fst(list)(('abc', 'def'))
     (['a', 'b', 'c'], 'def')
     """
-    return lambda pair: (f(pair[0]), pair[1])
+    def lift_fst_f(pair):
+        return (f(pair[0]), pair[1])
+    return lift_fst_f
 
+@_instrument.profiled
 def lift_snd(f):
     """Lift a function f onto the second element of a 2-tuple.
     >>> lift_snd(list)(('abc', 'def'))
     ('abc', ['d', 'e', 'f'])
     """
-    return lambda pair: (pair[0], f(pair[1]))
+    def lift_snd_f(pair):
+        return (pair[0], f(pair[1]))
+    return lift_snd_f
 
 def swap(pair):
     """Swap the items in a pair.  Return tuple.
@@ -42,6 +55,7 @@ def swap(pair):
     x, y = pair
     return y, x
 
+@_instrument.profiled
 def decorate(f):
     """decorate(f)(item) => (f(item), item)
 
@@ -68,8 +82,200 @@ def decorate(f):
     However it's useful if the function you're using doesn't have a 'key'
     argument.  If your function is higher-order, and doesn't handle
     tuples, lift_fst might help.
+
+    For sorting, sort_by, top_k and bottom_k do the decorating and
+    undecorating for you.
+    """
+    def decorate_f(item):
+        return (f(item), item)
+    return decorate_f
+
+def sort_by(f, reverse=False, executor=None, chunksize=1):
+    """sort_by(f)(iterable) => iterator over items sorted by f(item)
+
+    Decorate-sort-undecorate: f is called exactly once per item, the sort is
+    stable, items themselves are never compared, and the undecorating is
+    done lazily as you iterate over the result.
+
+    executor: A concurrent.futures executor to compute the keys in,
+              for when f is expensive.
+    chunksize: Passed to executor.map.
+
+    >>> list(sort_by(len)(['ccc', 'a', 'bb', 'd']))
+    ['a', 'd', 'bb', 'ccc']
+    >>> list(sort_by(len, reverse=True)(['ccc', 'a', 'bb', 'd']))
+    ['ccc', 'bb', 'a', 'd']
+
+    Items that can't be compared are fine, as only keys are compared:
+
+    >>> list(sort_by(len)([{1: 2, 3: 4}, {}]))
+    [{}, {1: 2, 3: 4}]
+
+    >>> from concurrent.futures import ThreadPoolExecutor
+    >>> with ThreadPoolExecutor(2) as executor:
+    ...     list(sort_by(abs, executor=executor)([3, -1, 2]))
+    [-1, 2, 3]
+    """
+    def sort_by_f(iterable):
+        items = list(iterable)
+        if executor is None:
+            keys = imap(f, items)
+        else:
+            keys = executor.map(f, items, chunksize=chunksize)
+        decorated = sorted(izip(keys, items), key=_KEY, reverse=reverse)
+        return imap(_ITEM, decorated)
+    return sort_by_f
+
+@_instrument.profiled
+def top_k(k, f=None):
+    """top_k(k, f=None)(iterable) => list of the k largest items by f(item)
+
+    Uses a heap of size k, so it runs in O(n log k) time and O(k) memory,
+    and works on streams.  f is called once per item.  The result is
+    largest first, and ties keep their original order.
+
+    >>> top_k(2, len)(iter(['a', 'ccc', 'bb', 'dd']))
+    ['ccc', 'bb']
+    >>> top_k(3)([5, 1, 4, 2, 3])
+    [5, 4, 3]
+    """
+    def top_k_f(iterable):
+        return heapq.nlargest(k, iterable, key=f)
+    return top_k_f
+
+@_instrument.profiled
+def bottom_k(k, f=None):
+    """bottom_k(k, f=None)(iterable) => list of the k smallest items by f(item)
+
+    The counterpart of top_k.  The result is smallest first.
+
+    >>> bottom_k(2, len)(iter(['ccc', 'dd', 'a', 'bb']))
+    ['a', 'dd']
+    """
+    def bottom_k_f(iterable):
+        return heapq.nsmallest(k, iterable, key=f)
+    return bottom_k_f
+
+class PairSequence(object):
+    """A compact sequence of pairs, stored as two parallel columns.
+
+    Holding millions of 2-tuples costs 56+ bytes per tuple on top of the
+    items themselves.  A PairSequence keeps the first and second elements in
+    two columns instead, using array.array where the values allow, so a
+    pair of ints or floats costs 16 bytes.  Tuples are only built as you
+    index or iterate.
+
+    >>> ps = PairSequence.from_pairs([(1, 'one'), (2, 'two'), (3, 'three')])
+    >>> ps
+    PairSequence([(1, 'one'), (2, 'two'), (3, 'three')])
+    >>> len(ps), ps[0], ps[-1]
+    (3, (1, 'one'), (3, 'three'))
+    >>> ps.firsts
+    array('q', [1, 2, 3])
+
+    swap() just swaps the columns over, so it doesn't copy anything:
+
+    >>> ps.swap()[1]
+    ('two', 2)
+
+    lift_fst and lift_snd work a column at a time:
+
+    >>> ps.lift_fst(float).lift_snd(len)
+    PairSequence([(1.0, 3), (2.0, 3), (3.0, 5)])
+    >>> ps.lift_fst(float).firsts
+    array('d', [1.0, 2.0, 3.0])
+    >>> list(map(swap, ps[1:]))
+    [('two', 2), ('three', 3)]
+    """
+    __slots__ = ('firsts', 'seconds')
+
+    def __init__(self, firsts, seconds):
+        if len(firsts) != len(seconds):
+            raise ValueError("columns must be the same length, got %d and %d"
+                             % (len(firsts), len(seconds)))
+        self.firsts = firsts
+        self.seconds = seconds
+
+    @classmethod
+    def from_pairs(cls, pairs, typecodes=(None, None)):
+        """Build a PairSequence from an iterable of pairs.
+
+        typecodes: array.array typecodes for the two columns.  Where a
+                   typecode is None, an array is used if the values are all
+                   ints or all floats, otherwise a list.
+        """
+        firsts = []
+        seconds = []
+        append_first = firsts.append
+        append_second = seconds.append
+        for first, second in pairs:
+            append_first(first)
+            append_second(second)
+        return cls(_compact(firsts, typecodes[0]),
+                   _compact(seconds, typecodes[1]))
+
+    def __len__(self):
+        return len(self.firsts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PairSequence(self.firsts[index], self.seconds[index])
+        return (self.firsts[index], self.seconds[index])
+
+    def __iter__(self):
+        return izip(self.firsts, self.seconds)
+
+    def __repr__(self):
+        return 'PairSequence(%r)' % (list(self),)
+
+    def fst(self):
+        """Return the column of first elements.
+        """
+        return self.firsts
+
+    def snd(self):
+        """Return the column of second elements.
+        """
+        return self.seconds
+
+    def swap(self):
+        """Return a PairSequence with the columns swapped, without copying.
+        """
+        return PairSequence(self.seconds, self.firsts)
+
+    def lift_fst(self, f, typecode=None):
+        """Return a new PairSequence with f applied to the first column.
+
+        The second column is shared, not copied.
+        """
+        return PairSequence(_compact(list(imap(f, self.firsts)), typecode),
+                            self.seconds)
+
+    def lift_snd(self, f, typecode=None):
+        """Return a new PairSequence with f applied to the second column.
+
+        The first column is shared, not copied.
+        """
+        return PairSequence(self.firsts,
+                            _compact(list(imap(f, self.seconds)), typecode))
+
+def _compact(values, typecode=None):
+    """Return values as an array.array if possible, otherwise a list.
     """
-    return lambda item: (f(item), item)
+    if typecode is not None:
+        return array.array(typecode, values)
+    types = set(imap(type, values))
+    try:
+        if types == set([int]):
+            return array.array('q', values)
+        if types == set([float]):
+            return array.array('d', values)
+    except OverflowError:
+        pass
+    return values
+
+_KEY = operator.itemgetter(0)
+_ITEM = operator.itemgetter(1)
 
 
 if __name__ == "__main__":
@@ -34,10 +34,33 @@ Note that passnone is curried, so you can use map instead:
 
 
 For even more complex usage, consider using Option from fn.monad.
+
+
+Whole columns
+=============
+
+passnone_column, apply_if_column and pass_if_column do the same job on a
+whole column (a sequence or NumPy array) at once.  They work out which
+positions to apply the function to up front, as a mask, then apply it only
+to those positions.  For NumPy arrays that's done in bulk with boolean
+indexing, without a Python-level branch per element:
+
+>>> list(passnone_column(toUpper)(input_strings))
+['A', 'B', 'CDE', 'F', None, 'G', 'H', None]
 """
 
+import array as _array
+import itertools as _itertools
+import operator as _operator
+
 from .flogic import fnot
+from . import instrument as _instrument
+from .op import Expr as _Expr
+
+from . import _lazy
+from ._lazy import numpy as _numpy
 
+@_instrument.profiled
 def passnone(f, default=None):
     """passnone(f)(val) returns None if val is None, else f(val).
 
@@ -46,6 +69,13 @@ def passnone(f, default=None):
 
     WARNING: I'm very likely to deprecate passnone soon.
     """
+    if _instrument.is_enabled():
+        def is_not_none(val):
+            return val is not None
+        def passnone_default(val):
+            return default
+        return _traced_apply_if('passnone', is_not_none, f,
+                                otherwise=passnone_default)
     def passnone_f(val):
         """Return f(val) if val is not None, else None
         """
@@ -53,6 +83,7 @@ def passnone(f, default=None):
     return passnone_f
 
 
+@_instrument.profiled
 def apply_if(predicate, function):
     """apply_if(predicate, function)(val) -> a value or None
 
@@ -69,10 +100,13 @@ def apply_if(predicate, function):
     >>> list(map(apply_if(contains_a, to_upper), strings))
     ['A', 'b', 'C', 'DEAR', 'APPLE', 'rod']
     """
+    if _instrument.is_enabled():
+        return _traced_apply_if('apply_if', predicate, function)
     def pass_if_pf(val):
         return function(val) if predicate(val) else val
     return pass_if_pf
 
+@_instrument.profiled
 def pass_if(predicate, function):
     """pass_if(predicate, function)(val) -> a value or None
 
@@ -89,8 +123,227 @@ def pass_if(predicate, function):
     >>> list(map(pass_if(contains_a, to_upper), strings))
     ['a', 'B', 'C', 'dear', 'apple', 'ROD']
     """
+    if _instrument.is_enabled():
+        return _traced_apply_if('pass_if', fnot(predicate), function)
     return apply_if(fnot(predicate), function)
 
+def _traced_apply_if(combinator, predicate, function, otherwise=None):
+    """Instrumented apply_if.
+
+    Records the predicate and the function as separate stages.  A value
+    the function is skipped for counts as a short-circuit of the function,
+    but not as a call.
+
+    >>> registry = _instrument.enable(_instrument.Registry())
+    >>> list(map(passnone(str), [1, None, 2]))
+    ['1', None, '2']
+    >>> _instrument.disable()
+    >>> registry.stats()[('passnone', 'function:str')]  # doctest: +ELLIPSIS
+    StageStats(calls=2, short_circuits=1, elapsed=...)
+    """
+    predicate_key = (combinator, 'predicate:%s' % _instrument.stage_name(predicate))
+    function_key = (combinator, 'function:%s' % _instrument.stage_name(function))
+    timer = _instrument.timer
+    def traced_apply_if(val):
+        registry = _instrument.registry
+        started = timer()
+        selected = predicate(val)
+        middle = timer()
+        registry.record(predicate_key, middle - started)
+        if not selected:
+            registry.stage(function_key).short_circuits += 1
+            return val if otherwise is None else otherwise(val)
+        result = function(val)
+        registry.record(function_key, timer() - middle)
+        return result
+    return traced_apply_if
+
+def passnone_column(f, default=None, vectorised=None, chunk_size=65536):
+    """passnone_column(f)(column, null_mask=None) -> new column
+
+    Like map(passnone(f, default), column), but for a whole column at once.
+
+    null_mask: A sequence of bools, True where the column holds a null.
+               Worked out from the None values in the column if not given.
+    vectorised: Whether to call f once on an array of all the selected
+                values, instead of once per value.  Only used for NumPy
+                arrays.  Defaults to True if f is a funbox.op expression.
+    chunk_size: For NumPy arrays and non-vectorised f, how many values to
+                convert at a time.
+
+    Null positions keep their original value, unless you give a default.
+
+    >>> passnone_column(len)(['ab', None, 'cde'])
+    [2, None, 3]
+    >>> passnone_column(len, default=0)(['ab', None, 'cde'])
+    [2, 0, 3]
+
+    A null mask lets you treat other values as null:
+
+    >>> from .op import mul
+    >>> passnone_column(mul(2))([1, -1, 3], null_mask=[False, True, False])
+    [2, -1, 6]
+    """
+    def passnone_column_f(column, null_mask=None):
+        column = _as_column(column)
+        if null_mask is None:
+            if not _is_ndarray(column):
+                # No need for a separate pass to build a mask
+                return _rebuild(column, [default if value is None else f(value)
+                                         for value in column])
+            null_mask = _null_mask(column)
+        return _apply_masked(f, column, null_mask, vectorised, chunk_size,
+                             apply_where=False, fill=default)
+    return passnone_column_f
+
+def apply_if_column(predicate, function, vectorised=None, chunk_size=65536):
+    """apply_if_column(predicate, function)(column, mask=None) -> new column
+
+    Like map(apply_if(predicate, function), column) for a whole column.
+
+    mask: A sequence of bools to use instead of calling predicate,
+          True where function should be applied.  predicate can be None
+          if you always give a mask.
+
+    See passnone_column for vectorised and chunk_size.
+
+    >>> contains_a = lambda astr : 'a' in astr
+    >>> to_upper = lambda astr : astr.upper()
+    >>> strings = ['a', 'b', 'C', 'dear', 'apple', 'rod']
+    >>> apply_if_column(contains_a, to_upper)(strings)
+    ['A', 'b', 'C', 'DEAR', 'APPLE', 'rod']
+    >>> apply_if_column(None, to_upper)(strings, mask=[1, 1, 0, 0, 0, 0])
+    ['A', 'B', 'C', 'dear', 'apple', 'rod']
+    >>> apply_if_column(None, to_upper)(strings, mask=[1, 1])
+    Traceback (most recent call last):
+        ...
+    ValueError: mask has 2 entries for a column of 6
+
+    An array.array stays an array.array if the results fit:
+
+    >>> from array import array
+    >>> from .op import gt, mul
+    >>> apply_if_column(gt(2), mul(10))(array('i', [1, 2, 3, 4]))
+    array('i', [1, 2, 30, 40])
+    """
+    def apply_if_column_f(column, mask=None):
+        column = _as_column(column)
+        if mask is None:
+            mask = _predicate_mask(predicate, column)
+        return _apply_masked(function, column, mask, vectorised, chunk_size)
+    return apply_if_column_f
+
+def pass_if_column(predicate, function, vectorised=None, chunk_size=65536):
+    """pass_if_column(predicate, function)(column, mask=None) -> new column
+
+    Like map(pass_if(predicate, function), column) for a whole column.
+
+    mask: A sequence of bools to use instead of calling predicate,
+          True where the value should be passed through unchanged.
+
+    >>> contains_a = lambda astr : 'a' in astr
+    >>> to_upper = lambda astr : astr.upper()
+    >>> strings = ['a', 'b', 'C', 'dear', 'apple', 'rod']
+    >>> pass_if_column(contains_a, to_upper)(strings)
+    ['a', 'B', 'C', 'dear', 'apple', 'ROD']
+    """
+    def pass_if_column_f(column, mask=None):
+        column = _as_column(column)
+        if mask is None:
+            mask = _predicate_mask(predicate, column)
+        return _apply_masked(function, column, mask, vectorised, chunk_size,
+                             apply_where=False)
+    return pass_if_column_f
+
+def _is_ndarray(column):
+    return _lazy.is_ndarray(column)
+
+def _as_column(column):
+    if hasattr(column, '__len__') and hasattr(column, '__getitem__'):
+        return column
+    return list(column)
+
+def _null_mask(column):
+    if column.dtype != object:
+        return _numpy.zeros(len(column), dtype=bool)
+    return _numpy.fromiter(
+        map(_operator.is_, column, _itertools.repeat(None)),
+        dtype=bool, count=len(column))
+
+def _predicate_mask(predicate, column):
+    if _is_ndarray(column):
+        if isinstance(predicate, _Expr):
+            return _numpy.asarray(predicate.vectorise()(column), dtype=bool)
+        return _numpy.fromiter(map(predicate, column), dtype=bool,
+                               count=len(column))
+    return list(map(predicate, column))
+
+def _apply_masked(function, column, mask, vectorised, chunk_size,
+                  apply_where=True, fill=None):
+    """Return a copy of column with function applied where mask is apply_where.
+
+    If fill is not None, the other positions are set to fill.
+    """
+    if len(mask) != len(column):
+        raise ValueError("mask has %d entries for a column of %d"
+                         % (len(mask), len(column)))
+    if _is_ndarray(column):
+        selected = _numpy.asarray(mask, dtype=bool)
+        if not apply_where:
+            selected = ~selected
+        return _apply_masked_array(function, column, selected, vectorised,
+                                   chunk_size, fill)
+    # Timings showed a single comprehension beats scattering the results
+    # back with map/deque for plain sequences.
+    if apply_where:
+        out = [function(value) if chosen else (value if fill is None else fill)
+               for (value, chosen) in zip(column, mask)]
+    else:
+        out = [(value if fill is None else fill) if skipped else function(value)
+               for (value, skipped) in zip(column, mask)]
+    return _rebuild(column, out)
+
+def _rebuild(column, out):
+    if isinstance(column, _array.array):
+        try:
+            return _array.array(column.typecode, out)
+        except (TypeError, OverflowError):
+            return out
+    return out
+
+def _apply_masked_array(function, column, selected, vectorised, chunk_size,
+                        fill):
+    values = column[selected]
+    if vectorised is None:
+        vectorised = isinstance(function, _Expr)
+    if vectorised:
+        vector_function = (function.vectorise() if isinstance(function, _Expr)
+                           else function)
+        results = _numpy.asarray(vector_function(values))
+    elif len(values):
+        results = _numpy.concatenate([
+            _numpy.asarray(list(map(function, values[start:start + chunk_size])))
+            for start in range(0, len(values), chunk_size)
+        ])
+    else:
+        results = values
+    # Values passed through must keep their type, so only widen within a
+    # kind (int8 to int64, say) and otherwise fall back to object.
+    dtype = _common_dtype(column.dtype, results.dtype)
+    if fill is not None:
+        dtype = _common_dtype(dtype, _numpy.asarray(fill).dtype)
+    out = column.astype(dtype, copy=True)
+    out[selected] = results
+    if fill is not None:
+        out[~selected] = fill
+    return out
+
+def _common_dtype(first, second):
+    first, second = _numpy.dtype(first), _numpy.dtype(second)
+    if first == object or second == object or first.kind != second.kind:
+        return _numpy.dtype(object)
+    return _numpy.result_type(first, second)
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
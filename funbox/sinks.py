@@ -0,0 +1,317 @@
+#! /usr/bin/env python
+
+"""Buffered output sinks, for writing lots of small pieces of text without
+building them all up in memory first.
+
+>>> import io
+>>> from .op import format_as
+>>> out = io.StringIO()
+>>> with FormatSink(out, format_as('%s=%d')) as sink:
+...     sink.write_many([('a', 1), ('b', 2), ('c', 3)])
+>>> print(out.getvalue())
+a=1
+b=2
+c=3
+<BLANKLINE>
+>>> sink.records
+3
+"""
+
+import itertools
+import re as _re
+import time
+
+from .op import Expr as _Expr
+
+_CONVERSION_RE = _re.compile(
+    r'%(?:\((?P<key>[^)]*)\))?[#0\- +]*(?P<width>\*|\d+)?'
+    r'(?:\.(?P<precision>\*|\d+))?[hlL]?(?P<type>[diouxXeEfFgGcrsa%])'
+)
+
+def parse_format(format_string):
+    """Parse a %-style format string.
+
+    Returns the number of values it consumes, or None if it takes a mapping
+    or uses '*' widths, in which case the number of values isn't fixed.
+
+    >>> parse_format('%s=%d')
+    2
+    >>> parse_format('100%% %s')
+    1
+    >>> parse_format('%(name)s')
+    >>> parse_format('%*d')
+    """
+    if isinstance(format_string, bytes) and not isinstance(format_string, str):
+        format_string = format_string.decode('latin-1')
+    arity = 0
+    for match in _CONVERSION_RE.finditer(format_string):
+        if match.group('type') == '%':
+            continue
+        if (match.group('key') is not None or match.group('width') == '*'
+                or match.group('precision') == '*'):
+            return None
+        arity += 1
+    return arity
+
+
+class _BufferedSink(object):
+    """Base for sinks which collect strings and write them out in chunks.
+
+    target: A file-like object with a write() method, a socket-like object
+            with a sendall() method, or a bytearray.
+    buffer_size: Number of characters to collect before writing.
+    encoding: If set, chunks are encoded to bytes with this before writing.
+              Defaults to utf-8 for bytearray targets.
+    """
+    def __init__(self, target, buffer_size=65536, encoding=None):
+        if isinstance(target, bytearray):
+            self._write = target.extend
+            encoding = encoding or 'utf-8'
+        elif hasattr(target, 'write'):
+            self._write = target.write
+        else:
+            self._write = target.sendall
+        self._target = target
+        self._encoding = encoding
+        self._buffer_size = buffer_size
+        self._pending = []
+        self._pending_size = 0
+        self._empty = None
+        self.records = 0
+        self.chars = 0
+        self.flushes = 0
+        self.elapsed = 0.0
+        self._timed_records = 0
+
+    def _add(self, chunk):
+        self._pending.append(chunk)
+        self._pending_size += len(chunk)
+        if self._pending_size >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write out anything buffered so far.
+        """
+        if not self._pending:
+            return
+        if self._empty is None:
+            self._empty = self._pending[0][:0]
+        chunk = self._empty.join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        self.chars += len(chunk)
+        if self._encoding is not None and not isinstance(chunk, bytes):
+            chunk = chunk.encode(self._encoding)
+        self._write(chunk)
+        self.flushes += 1
+
+    def close(self):
+        """Flush the buffer.  The target is left open.
+        """
+        self.flush()
+
+    def records_per_second(self):
+        """Throughput of the write_many calls so far.
+
+        Single write() calls aren't timed, to keep them cheap, so they're
+        left out of this figure.
+        """
+        return self._timed_records / self.elapsed if self.elapsed else 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FormatSink(_BufferedSink):
+    """Format records with a %-style format and write them out in chunks.
+
+    FormatSink(target, format_spec, line_end='\\n', ...)
+
+    format_spec: A format string, or an op.format_as(format_string) expression.
+    line_end: Written after every record.
+    batch_size: Records formatted with a single % operation.
+
+    The format string is parsed once up front.  If it takes a fixed number
+    of values, batches of records are formatted with one % operation on a
+    repeated format string, instead of one per record.
+
+    Counters: records, chars, flushes and elapsed (seconds spent in
+    write_many).
+
+    >>> out = bytearray()
+    >>> sink = FormatSink(out, '0x%x', line_end=' ', buffer_size=4)
+    >>> sink.write_many(range(10, 13))
+    >>> sink.write(15)
+    >>> sink.close()
+    >>> bytes(out)
+    b'0xa 0xb 0xc 0xf '
+    >>> sink.records, sink.chars
+    (4, 16)
+    >>> sink.elapsed = 1.0   # Only the three records from write_many count
+    >>> sink.records_per_second()
+    3.0
+
+    Mapping formats are supported too, a record at a time:
+
+    >>> import io
+    >>> out = io.StringIO()
+    >>> with FormatSink(out, '%(a)s-%(b)s', line_end=';') as sink:
+    ...     sink.write_many([{'a': 1, 'b': 2}, {'a': 3, 'b': 4}])
+    >>> out.getvalue()
+    '1-2;3-4;'
+
+    Bytes formats write bytes:
+
+    >>> out = io.BytesIO()
+    >>> with FormatSink(out, b'%d') as sink:
+    ...     sink.write_many([1, 2])
+    >>> out.getvalue().splitlines()
+    [b'1', b'2']
+    """
+    def __init__(self, target, format_spec, line_end='\n', buffer_size=65536,
+                 encoding=None, batch_size=256):
+        _BufferedSink.__init__(self, target, buffer_size, encoding)
+        if isinstance(format_spec, _Expr):
+            # An op.format_as expression
+            format_spec = format_spec.operand
+        if isinstance(format_spec, bytes) and not isinstance(line_end, bytes):
+            line_end = line_end.encode('ascii')
+        self.format_string = format_spec
+        self.line_end = line_end
+        percent = b'%' if isinstance(line_end, bytes) else '%'
+        self._record_format = format_spec + line_end.replace(percent, percent * 2)
+        self._arity = parse_format(format_spec)
+        self._batch_size = batch_size
+        self._batch_format = self._record_format * batch_size
+
+    def write(self, record):
+        """Format and write a single record.
+        """
+        self._add(self._record_format % record)
+        self.records += 1
+
+    def write_many(self, records):
+        """Format and write every record from an iterable.
+        """
+        started = time.time()
+        arity = self._arity
+        if not arity:
+            record_format = self._record_format
+            count = 0
+            for record in records:
+                self._add(record_format % record)
+                count += 1
+            self.records += count
+            self._timed_records += count
+        else:
+            records = iter(records)
+            while True:
+                batch = list(itertools.islice(records, self._batch_size))
+                if not batch:
+                    break
+                self._add(self._format_batch(batch, arity))
+                self.records += len(batch)
+                self._timed_records += len(batch)
+        self.elapsed += time.time() - started
+
+    def _format_batch(self, batch, arity):
+        if arity == 1:
+            if all(not isinstance(record, tuple) or len(record) == 1
+                   for record in batch):
+                values = tuple(
+                    record[0] if isinstance(record, tuple) else record
+                    for record in batch
+                )
+            else:
+                values = None
+        elif all(isinstance(record, tuple) and len(record) == arity
+                 for record in batch):
+            values = tuple(itertools.chain.from_iterable(batch))
+        else:
+            values = None
+        if values is None:
+            # Let % raise its usual errors for odd records
+            return self._record_format[:0].join(
+                self._record_format % record for record in batch)
+        if len(batch) == self._batch_size:
+            batch_format = self._batch_format
+        else:
+            batch_format = self._record_format * len(batch)
+        return batch_format % values
+
+
+class JoinSink(_BufferedSink):
+    r"""Write items joined with a separator, in chunks.
+
+    JoinSink(target, sep, terminate=False, ...)
+
+    Like target.write(sep.join(items)), but without building the whole
+    string, so memory use stays constant however many items there are.
+    Items can be str or bytes, as long as sep is the same type.
+
+    terminate: Write sep after every item, rather than between them.
+               Useful for writing lines, with sep='\n'.
+    batch_size: Items joined with a single sep.join.
+
+    Counters: records, chars, flushes and elapsed (seconds spent in
+    write_many).
+
+    >>> import io
+    >>> out = io.BytesIO()
+    >>> with JoinSink(out, b', ', buffer_size=4) as sink:
+    ...     sink.write_many([b'a', b'b'])
+    ...     sink.write_many(iter([b'c']))
+    ...     sink.write(b'd')
+    >>> out.getvalue()
+    b'a, b, c, d'
+    >>> out = io.StringIO()
+    >>> with JoinSink(out, '\n', terminate=True) as sink:
+    ...     sink.write_many(['one', 'two'])
+    >>> out.getvalue()
+    'one\ntwo\n'
+    """
+    def __init__(self, target, sep, terminate=False, buffer_size=65536,
+                 encoding=None, batch_size=1024):
+        _BufferedSink.__init__(self, target, buffer_size, encoding)
+        self.sep = sep
+        self.terminate = terminate
+        self._batch_size = batch_size
+
+    def write(self, item):
+        """Write a single item.
+        """
+        if self.terminate:
+            self._add(item + self.sep)
+        elif self.records:
+            self._add(self.sep + item)
+        else:
+            self._add(item)
+        self.records += 1
+
+    def write_many(self, items):
+        """Write every item from an iterable.
+        """
+        started = time.time()
+        sep = self.sep
+        items = iter(items)
+        while True:
+            batch = list(itertools.islice(items, self._batch_size))
+            if not batch:
+                break
+            joined = sep.join(batch)
+            if self.terminate:
+                joined += sep
+            elif self.records:
+                joined = sep + joined
+            self._add(joined)
+            self.records += len(batch)
+            self._timed_records += len(batch)
+        self.elapsed += time.time() - started
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
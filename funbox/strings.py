@@ -3,11 +3,18 @@
 """Tools for strings.
 """
 
+import collections as _collections
 import re as _re
+from . import instrument as _instrument
 from . import once as _once
+from . import sinks as _sinks
 
 _WORDS_RE = _once.Once(_re.compile, r'\w+')
+# Bytes counterpart of _WORDS_RE.  Non-ASCII bytes count as word characters,
+# so UTF-8 encoded words are kept whole.
+_BYTES_WORDS_RE = _once.Once(_re.compile, br'(?:\w|[\x80-\xff])+')
 
+@_instrument.profiled
 def join(sep):
     """join(sep)(iterable) Join strings in iterable with sep.
 
@@ -21,6 +28,40 @@ def join(sep):
         return sep.join(iterable)
     return join_sep
 
+@_instrument.profiled
+def join_to(sep, target, lines=False, buffer_size=65536, encoding=None):
+    r"""join_to(sep, target)(iterable) Write strings in iterable joined with sep.
+
+    str -> file -> [str] -> int
+
+    A streaming version of join: the joined string is written to target
+    (a file-like object, socket-like object or bytearray) a buffer at a
+    time instead of being built in memory.  Returns the number of items.
+    Works with bytes too.
+
+    lines: Write sep after every item, not just between them.
+
+    >>> import io
+    >>> out = io.StringIO()
+    >>> join_to(', ', out)(['a', 'b', 'c', 'd'])
+    4
+    >>> out.getvalue()
+    'a, b, c, d'
+    >>> out = bytearray()
+    >>> join_to(b'\n', out, lines=True)(iter([b'x', b'y']))
+    2
+    >>> bytes(out)
+    b'x\ny\n'
+
+    See funbox.sinks.JoinSink to write to the same target in several goes.
+    """
+    def join_sep_to(iterable):
+        with _sinks.JoinSink(target, sep, terminate=lines,
+                             buffer_size=buffer_size, encoding=encoding) as sink:
+            sink.write_many(iterable)
+        return sink.records
+    return join_sep_to
+
 def words(string):
     r"""Return string split into words.
 
@@ -29,6 +70,197 @@ def words(string):
     """
     return _WORDS_RE().findall(string)
 
+def iter_words(source, chunk_size=1 << 20):
+    r"""Generate the words from a file, a chunk at a time.
+
+    Like words(), but streams through a file object or mmap, rather than
+    needing all the text in memory.  Words split across chunk boundaries
+    are put back together.
+
+    source: Anything with a read(size) method, or a str or bytes.
+
+    Text sources give str words, matched as in words().  Binary sources
+    (including mmaps) use a bytes regex, which is quicker, and give bytes
+    words.  That's exact for ASCII.  For UTF-8 it treats every non-ASCII
+    character as part of a word.
+
+    >>> import io
+    >>> list(iter_words(io.StringIO('abc def     ghi\njkl\n'), chunk_size=5))
+    ['abc', 'def', 'ghi', 'jkl']
+    >>> list(iter_words(io.BytesIO(b'caf\xc3\xa9 au lait'), chunk_size=4))
+    [b'caf\xc3\xa9', b'au', b'lait']
+    """
+    for chunk_words in _chunk_words(source, chunk_size):
+        for word in chunk_words:
+            yield word
+
+def count_words(source, counter=None, chunk_size=1 << 20):
+    r"""Count the words from a file into a Counter, a chunk at a time.
+
+    Takes the same source as iter_words, but never builds a list of more
+    than one chunk's words.  If you give a counter, it's updated in place
+    and returned, so you can count several files into it.
+
+    >>> import io
+    >>> counts = count_words(io.StringIO('the cat and the hat\nthe end'), chunk_size=6)
+    >>> counts.most_common(2)
+    [('the', 3), ('cat', 1)]
+    """
+    if counter is None:
+        counter = _collections.Counter()
+    for chunk_words in _chunk_words(source, chunk_size):
+        counter.update(chunk_words)
+    return counter
+
+def _chunk_words(source, chunk_size):
+    """Generate a list of words per chunk of source.
+    """
+    if not hasattr(source, 'read'):
+        yield _words_re(source).findall(source)
+        return
+    leftover = None
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        if leftover:
+            chunk = leftover + chunk
+        found = _words_re(chunk).findall(chunk)
+        # If the chunk ends in a word, it may carry on in the next chunk.
+        # The last word found can only be a suffix of the chunk if it ends it.
+        if found and chunk.endswith(found[-1]):
+            leftover = found.pop()
+        else:
+            leftover = None
+        yield found
+    if leftover:
+        yield [leftover]
+
+def _words_re(text):
+    return _BYTES_WORDS_RE() if isinstance(text, bytes) else _WORDS_RE()
+
+
+class KeywordMatcher(object):
+    r"""Find any of a set of keywords in text, in one pass.
+
+    Built once from a list of keywords, as an Aho-Corasick automaton,
+    so searching takes time proportional to the length of the text plus
+    the number of matches, however many keywords there are.  That beats
+    testing each keyword with 'in', or a big alternation regex, once
+    there are more than a few dozen keywords (see
+    benchmarks/keyword_search.py).
+
+    Keywords can be str or bytes, to match text of the same type.
+    (Bytes iterate as ints, but the automaton doesn't care what its
+    symbols are, as long as keywords and text agree.)
+
+    >>> matcher = KeywordMatcher(['he', 'she', 'his', 'hers'])
+    >>> list(matcher.finditer('ushers'))
+    [(1, 'she'), (2, 'he'), (2, 'hers')]
+    >>> matcher.search('this')
+    (1, 'his')
+    >>> matcher.search('nothing') is None
+    True
+
+    To match whole words only, use the word-based methods, which use the
+    same streaming tokenizer as iter_words:
+
+    >>> import io
+    >>> list(matcher.find_words(io.StringIO('she said his hat was hers')))
+    ['she', 'his', 'hers']
+    >>> matcher.count_words(io.StringIO('he and she and he'))['he']
+    2
+    """
+    def __init__(self, keywords):
+        self.keywords = frozenset(keywords)
+        # State 0 is the root.  _goto holds the trie edges, and
+        # _transitions caches the full automaton transitions as they're
+        # needed, so the search loop is a dict lookup per character.
+        goto = [{}]
+        outputs = [()]
+        for keyword in self.keywords:
+            if not keyword:
+                raise ValueError("keywords must not be empty")
+            state = 0
+            for symbol in keyword:
+                next_state = goto[state].get(symbol)
+                if next_state is None:
+                    next_state = goto[state][symbol] = len(goto)
+                    goto.append({})
+                    outputs.append(())
+                state = next_state
+            outputs[state] = (keyword,)
+        fail = [0] * len(goto)
+        queue = _collections.deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and symbol not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(symbol, 0)
+                fail[next_state] = target if target != next_state else 0
+                outputs[next_state] += outputs[fail[next_state]]
+        self._goto = goto
+        self._fail = fail
+        self._outputs = outputs
+        self._transitions = [dict(edges) for edges in goto]
+
+    def _step(self, state, symbol):
+        """Work out and cache the transition out of state on symbol.
+        """
+        origin = state
+        goto = self._goto
+        while state and symbol not in goto[state]:
+            state = self._fail[state]
+        target = goto[state].get(symbol, 0)
+        self._transitions[origin][symbol] = target
+        return target
+
+    def finditer(self, text):
+        """Generate (start, keyword) for every occurrence of a keyword in text.
+
+        Overlapping occurrences are all found, in order of where they end.
+        """
+        transitions = self._transitions
+        outputs = self._outputs
+        step = self._step
+        state = 0
+        for end, symbol in enumerate(text, 1):
+            next_state = transitions[state].get(symbol)
+            if next_state is None:
+                next_state = step(state, symbol)
+            state = next_state
+            if outputs[state]:
+                for keyword in outputs[state]:
+                    yield (end - len(keyword), keyword)
+
+    def search(self, text):
+        """Return (start, keyword) for the first occurrence to end, or None.
+        """
+        for found in self.finditer(text):
+            return found
+        return None
+
+    def find_words(self, source, chunk_size=1 << 20):
+        """Generate the words in source (as for iter_words) which are keywords.
+        """
+        keywords = self.keywords
+        for chunk_words in _chunk_words(source, chunk_size):
+            for word in filter(keywords.__contains__, chunk_words):
+                yield word
+
+    def count_words(self, source, counter=None, chunk_size=1 << 20):
+        """Count the keywords among the words in source, into a Counter.
+        """
+        if counter is None:
+            counter = _collections.Counter()
+        keywords = self.keywords
+        for chunk_words in _chunk_words(source, chunk_size):
+            counter.update(filter(keywords.__contains__, chunk_words))
+        return counter
+
 
 if __name__ == "__main__":
     import doctest
@@ -1,6 +1,37 @@
 #! /usr/bin/env python
 
-"""Validation functions."""
+"""Validation functions.
+
+Schema validates whole records, or batches of them, against a spec of
+Field rules, with functions generated from the spec when it's created.
+
+>>> schema = Schema({
+...     'name': Field(str, regex=r'[A-Z][a-z]+'),
+...     'age': Field(int, min=0, max=150),
+...     'children': Field(natural=True, nullable=True),
+... })
+>>> schema.is_valid({'name': 'Fred', 'age': 43, 'children': None})
+True
+>>> sorted(schema.errors({'name': 'fred', 'age': 200, 'children': -1}))
+[('age', 'more than 150'), ('children', 'not a natural number'), ('name', "doesn't match '[A-Z][a-z]+'")]
+"""
+
+import re as _re
+
+from . import _lazy
+from ._lazy import numpy as _numpy
+
+try:
+    _INT_TYPES = (int, long)
+except NameError:
+    # Python 3 has no separate long type
+    _INT_TYPES = (int,)
+
+try:
+    _STRING_TYPES = (basestring,)
+except NameError:
+    # Python 3
+    _STRING_TYPES = (str,)
 
 def is_natural_number(n):
     """Return whether n is an integer >= 0
@@ -35,13 +66,283 @@ def is_int(n):
     >>> is_int('1')
     False
     """
-    int_types = (int,)
-    try:
-        int_types += (long,)
-    except NameError:
-        # This takes care of there not being a 'long' type in Python 3
-        pass
-    return isinstance(n, int_types)
+    return isinstance(n, _INT_TYPES)
+
+
+class Field(object):
+    """Rules for one field of a record, for Schema.
+
+    type: A type, or tuple of types, the value must be an instance of.
+          Defaults to int for natural numbers and str for regexes,
+          otherwise any type is allowed.
+    min, max: Inclusive bounds on the value.
+    natural: The value must be a whole number >= 0.  With the default
+             type that's an integer, as is_natural_number, but floats
+             such as 3.0 can be allowed with type=float.
+    regex: The whole value must match this pattern (a string or compiled
+           regex).
+    nullable: Allow None (and NaN, in NumPy columns).  Missing fields
+              count as None.
+    """
+    __slots__ = ('type', 'min', 'max', 'natural', 'regex', 'nullable')
+
+    def __init__(self, type=None, min=None, max=None, natural=False,
+                 regex=None, nullable=False):
+        if type is None:
+            if natural:
+                type = _INT_TYPES
+            elif regex is not None:
+                type = _STRING_TYPES
+        elif not isinstance(type, tuple):
+            type = (type,)
+        self.type = type
+        self.min = min
+        self.max = max
+        self.natural = natural
+        self.regex = regex
+        self.nullable = nullable
+
+    def __repr__(self):
+        settings = ['%s=%r' % (name, getattr(self, name))
+                    for name in self.__slots__ if getattr(self, name)]
+        return 'Field(%s)' % ', '.join(settings)
+
+
+class Schema(object):
+    """Validate records against a spec of {field name: Field}.
+
+    Schema(spec, fields=None)
+
+    spec: A dict of field name to Field, or just a type for a Field which
+          only checks the type.
+    fields: If given, records are sequences (such as CSV rows) with these
+            field names in order, rather than mappings.
+
+    Errors are (field name, message) tuples, with all of the errors for a
+    record reported rather than just the first.
+
+    The checks are compiled into Python functions when the Schema is
+    created, so there's no interpreting of the spec per record, and
+    validate_many checks a whole batch inside one generated function.
+
+    >>> schema = Schema({'id': Field(natural=True), 'score': float},
+    ...                 fields=['id', 'score'])
+    >>> schema.validate_many([[1, 0.5], [2, '0.5'], [-3, None]])
+    [(1, [('score', 'expected float, got str')]), (2, [('id', 'not a natural number'), ('score', 'missing')])]
+
+    Short rows are missing their last fields, and values which can't be
+    compared with min or max are errors too:
+
+    >>> schema.errors([1])
+    [('score', 'missing')]
+    >>> Schema({'size': Field(min=0)}).errors({'size': 'abc'})
+    [('size', 'not comparable, got str')]
+
+    Natural numbers must be whole, even when they're floats:
+
+    >>> counts = Schema({'n': Field(natural=True, type=float)}, fields=['n'])
+    >>> counts.validate_many([[3.0], [2.5], [float('inf')]])
+    [(1, [('n', 'not a natural number')]), (2, [('n', 'not a natural number')])]
+    """
+    def __init__(self, spec, fields=None):
+        self.spec = dict(
+            (name, rule if isinstance(rule, Field) else Field(rule))
+            for name, rule in spec.items()
+        )
+        self.fields = list(fields) if fields is not None else None
+        if self.fields is not None:
+            unknown = set(self.spec) - set(self.fields)
+            if unknown:
+                raise ValueError("no position for fields %s" % sorted(unknown))
+        self._compile()
+
+    def errors(self, record):
+        """Return a list of errors for record, empty if it's valid.
+        """
+        return self._errors(record)
+
+    def is_valid(self, record):
+        """Return whether record is valid, stopping at the first error.
+        """
+        return self._is_valid(record)
+
+    def validate_many(self, records):
+        """Return a list of (index, errors) for the invalid records.
+        """
+        return self._validate_many(records)
+
+    def check_columns(self, columns):
+        """Validate columns of values rather than records.
+
+        columns: A mapping of field name to column, such as
+                 csv_records.Columns, with a column for every field.
+
+        Returns (invalid, by_field): a mask of the rows with any error, and
+        a dict of field name to mask of the rows where that field is
+        invalid.  The masks are NumPy bool arrays if any column is a NumPy
+        array, otherwise lists of bools.
+
+        Numeric NumPy columns are checked with vectorised comparisons
+        instead of a value at a time, with NaN counting as null.
+
+        >>> import array
+        >>> schema = Schema({'age': Field(int, min=0), 'name': Field(regex='[a-z]+')})
+        >>> schema.check_columns({'age': array.array('q', [4, -1, 7]),
+        ...                       'name': ['fred', 'barney', 'Wilma']})
+        ([False, True, True], {'age': [False, True, False], 'name': [False, False, True]})
+        """
+        by_field = {}
+        for name, field in self.spec.items():
+            column = columns[name]
+            if (_lazy.is_ndarray(column) and column.dtype.kind in 'biuf'
+                    and field.regex is None):
+                by_field[name] = _numeric_mask(field, column)
+            else:
+                if _lazy.is_ndarray(column):
+                    column = column.tolist()
+                valid = self._value_checks[name]
+                by_field[name] = [not valid(value) for value in column]
+        masks = list(by_field.values())
+        if any(_lazy.is_ndarray(mask) for mask in masks):
+            for name in by_field:
+                by_field[name] = _numpy.asarray(by_field[name], dtype=bool)
+            invalid = _numpy.zeros(len(masks[0]), dtype=bool)
+            for mask in by_field.values():
+                invalid |= mask
+        elif masks:
+            invalid = [any(flags) for flags in zip(*masks)]
+        else:
+            invalid = []
+        return invalid, by_field
+
+    def __repr__(self):
+        return 'Schema(%r)' % (self.spec,)
+
+    def _compile(self):
+        namespace = {}
+        error_lines = []
+        valid_lines = []
+        self._value_checks = {}
+        for index, (name, field) in enumerate(sorted(self.spec.items())):
+            if self.fields is None:
+                access = 'record.get(%r)' % (name,)
+            else:
+                position = self.fields.index(name)
+                access = 'record[%d] if len(record) > %d else None' % (
+                    position, position)
+            _field_constants(index, field, namespace)
+            error_lines += _field_lines(
+                index, field, access,
+                lambda message, name=name: 'errors.append((%r, %s))' % (name, message))
+            valid_lines += _field_lines(index, field, access,
+                                        lambda message: 'return False')
+            check_source = '\n'.join(
+                ['def value_valid(value):']
+                + ['    ' + line
+                   for line in _field_lines(index, field, None,
+                                            lambda message: 'return False')]
+                + ['    return True', ''])
+            exec(check_source, namespace)
+            self._value_checks[name] = namespace.pop('value_valid')
+        source = '\n'.join(
+            ['def errors(record):',
+             '    errors = []']
+            + ['    ' + line for line in error_lines]
+            + ['    return errors',
+               '',
+               'def is_valid(record):']
+            + ['    ' + line for line in valid_lines]
+            + ['    return True',
+               '',
+               'def validate_many(records):',
+               '    failures = []',
+               '    for index, record in enumerate(records):',
+               '        errors = []']
+            + ['        ' + line for line in error_lines]
+            + ['        if errors:',
+               '            failures.append((index, errors))',
+               '    return failures',
+               ''])
+        exec(source, namespace)
+        self._errors = namespace['errors']
+        self._is_valid = namespace['is_valid']
+        self._validate_many = namespace['validate_many']
+
+
+def _type_names(types):
+    return ' or '.join(t.__name__ for t in types)
+
+def _field_constants(index, field, namespace):
+    namespace['_type%d' % index] = field.type
+    namespace['_min%d' % index] = field.min
+    namespace['_max%d' % index] = field.max
+    if field.regex is not None:
+        pattern = getattr(field.regex, 'pattern', field.regex)
+        flags = getattr(field.regex, 'flags', 0)
+        namespace['_match%d' % index] = _re.compile(
+            '(?:%s)\\Z' % pattern, flags).match
+
+def _field_lines(index, field, access, fail):
+    """Lines of code checking one field, with the value in 'value'.
+
+    access: Expression for getting the value from the record, or None if
+            'value' is already set.
+    fail: Function from a message expression to a statement for reporting
+          a failure.
+    """
+    lines = []
+    if access is not None:
+        lines.append('value = %s' % access)
+    lines.append('if value is None:')
+    lines.append('    ' + ('pass' if field.nullable else fail("'missing'")))
+    if field.type is not None:
+        lines.append('elif not isinstance(value, _type%d):' % index)
+        lines.append('    ' + fail("'expected %s, got ' + type(value).__name__"
+                                   % _type_names(field.type)))
+    checks = []
+    if field.natural:
+        # value % 1 is NaN for infinities, so they're rejected too
+        checks.append(('value < 0 or value % 1', repr('not a natural number')))
+    if field.min is not None:
+        checks.append(('value < _min%d' % index, repr('less than %r' % (field.min,))))
+    if field.max is not None:
+        checks.append(('value > _max%d' % index, repr('more than %r' % (field.max,))))
+    if field.regex is not None:
+        pattern = getattr(field.regex, 'pattern', field.regex)
+        checks.append(('_match%d(value) is None' % index,
+                       repr("doesn't match %r" % (pattern,))))
+    if checks:
+        lines.append('else:')
+        lines.append('    try:')
+        for condition, message in checks:
+            lines.append('        if %s:' % condition)
+            lines.append('            ' + fail(message))
+        lines.append('    except TypeError:')
+        lines.append('        ' + fail("'not comparable, got ' + type(value).__name__"))
+    return lines
+
+def _numeric_mask(field, column):
+    """Vectorised Field checks on a numeric NumPy column.
+    """
+    if column.dtype.kind == 'f':
+        null = _numpy.isnan(column)
+    else:
+        null = _numpy.zeros(len(column), dtype=bool)
+    invalid = _numpy.zeros(len(column), dtype=bool) if field.nullable else null.copy()
+    if field.type is not None:
+        python_type = {'b': bool, 'f': float}.get(column.dtype.kind, int)
+        if not issubclass(python_type, field.type):
+            invalid |= ~null
+    if field.natural:
+        invalid |= column < 0
+        if column.dtype.kind == 'f':
+            whole = _numpy.isfinite(column) & (column == _numpy.floor(column))
+            invalid |= ~null & ~whole
+    if field.min is not None:
+        invalid |= column < field.min
+    if field.max is not None:
+        invalid |= column > field.max
+    return invalid
 
 if __name__ == "__main__":
     import doctest
@@ -5,7 +5,7 @@ from setuptools import setup, find_packages
 setup(
     name = "funbox",
     version = "0.11.0.dev1",
-    packages = find_packages(),
+    packages = find_packages(exclude=['benchmarks', 'benchmarks.*']),
     author = "Nick Booker",
     author_email='nmb+pypi@nickbooker.uk',
     description = "Functional Toolbox",
@@ -20,7 +20,9 @@ setup(
         'Programming Language :: Python :: 3',
     ],
     keywords='development functional',
-    install_requires = [
-        'functional',
-    ],
+    entry_points = {
+        'console_scripts': [
+            'funbox = funbox.__main__:main',
+        ],
+    },
 )